@@ -0,0 +1,237 @@
+import asyncio
+import math
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ---------------- CONFIG ----------------
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "8"))
+INFERENCE_TIMEOUT = float(os.getenv("INFERENCE_TIMEOUT", "60"))
+
+# The intent classifier (one embedding) gets its own small pool, so it
+# never queues behind generations or takes their slots. Past the short
+# timeout the caller keeps the keyword route.
+CLASSIFIER_WORKERS = int(os.getenv("CLASSIFIER_WORKERS", "1"))
+CLASSIFIER_MAX_QUEUE = int(os.getenv("CLASSIFIER_MAX_QUEUE", "4"))
+CLASSIFIER_TIMEOUT = float(os.getenv("CLASSIFIER_TIMEOUT", "0.5"))
+
+
+class StreamCancelled(Exception):
+    """Raised inside a streaming job once its consumer has gone away."""
+
+
+class PoolSaturated(Exception):
+    """Raised when the inference queue is full."""
+
+    def __init__(self, retry_after: int):
+        super().__init__(f"Inference queue full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+# ---------------- INFERENCE POOL ----------------
+class InferencePool:
+    """
+    Dedicated, size-limited executor for model work.
+
+    At most `workers` jobs run at once and at most `max_queue` more may
+    wait. Anything beyond that is rejected immediately with PoolSaturated
+    so callers can answer 429 instead of piling up on the CPU.
+    """
+
+    def __init__(self, workers=INFERENCE_WORKERS, max_queue=INFERENCE_MAX_QUEUE, timeout=INFERENCE_TIMEOUT,
+                 name="inference", limit_threads=True):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+
+        # torch's thread count is process-wide, so only the main pool sets it
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers,
+            thread_name_prefix=name,
+            initializer=_limit_torch_threads if limit_threads else None,
+            initargs=(workers,) if limit_threads else ()
+        )
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._total_seconds = 0.0
+
+    # ---------------- ADMISSION ----------------
+    def try_acquire(self):
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PoolSaturated(self._retry_after_locked())
+            self._in_flight += 1
+
+    def release(self, seconds=None):
+        with self._lock:
+            self._in_flight -= 1
+            if seconds is not None:
+                self.completed += 1
+                self._total_seconds += seconds
+
+    def _retry_after_locked(self) -> int:
+        avg = self._total_seconds / self.completed if self.completed else 1.0
+        waiting = max(self._in_flight - self.workers, 0) + 1
+        return max(1, math.ceil(avg * waiting / self.workers))
+
+    # ---------------- EXECUTION ----------------
+    async def run(self, fn, *args, timeout=None):
+        """
+        Run `fn(*args)` on the pool. Raises PoolSaturated when full and
+        asyncio.TimeoutError when the job exceeds the timeout. A timed-out
+        job keeps its slot until it actually finishes, so a slow model
+        cannot be oversubscribed by retries.
+        """
+        self.try_acquire()
+
+        start = time.perf_counter()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release(time.perf_counter() - start))
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.wrap_future(future),
+                timeout=timeout or self.timeout
+            )
+        except asyncio.TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise
+
+    def stream(self, fn, *args, timeout=None):
+        """
+        Run `fn(*args, emit)` on the pool and return a PoolStream over the
+        items it passes to `emit`. Admission, the worker limit and the
+        timeout are the same as run(). The slot is released when the job
+        finishes, whether or not anyone reads the stream; once the stream
+        is closed, the next emit raises StreamCancelled so the job stops early.
+        """
+        self.try_acquire()
+
+        channel = queue.Queue()
+        cancelled = threading.Event()
+
+        def emit(item):
+            if cancelled.is_set():
+                raise StreamCancelled()
+            channel.put(item)
+
+        def job():
+            try:
+                fn(*args, emit)
+            except StreamCancelled:
+                pass
+            except BaseException as e:
+                channel.put(_StreamError(e))
+            finally:
+                channel.put(_STREAM_END)
+
+        start = time.perf_counter()
+        try:
+            future = self._executor.submit(job)
+        except Exception:
+            self.release()
+            raise
+        future.add_done_callback(lambda _: self.release(time.perf_counter() - start))
+
+        return PoolStream(self, channel, cancelled, start + (timeout or self.timeout))
+
+    def _count_timeout(self):
+        with self._lock:
+            self.timed_out += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": self._in_flight,
+                "queued": max(self._in_flight - self.workers, 0),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+                "avg_seconds": round(self._total_seconds / self.completed, 3) if self.completed else 0.0,
+            }
+
+
+# ---------------- STREAMING ----------------
+_STREAM_END = object()
+
+
+class _StreamError:
+    def __init__(self, error):
+        self.error = error
+
+
+class PoolStream:
+    """
+    Synchronous iterator over a streaming job's items. Raises the job's
+    exception if it failed, and TimeoutError once the pool timeout has
+    passed since submission (the job is then cancelled).
+    """
+
+    def __init__(self, pool, channel, cancelled, deadline):
+        self._pool = pool
+        self._channel = channel
+        self._cancelled = cancelled
+        self._deadline = deadline
+        self._finished = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._finished:
+            raise StopIteration
+
+        try:
+            item = self._channel.get(timeout=max(self._deadline - time.perf_counter(), 0))
+        except queue.Empty:
+            self._finished = True
+            self.close()
+            self._pool._count_timeout()
+            raise TimeoutError("inference stream timed out")
+
+        if item is _STREAM_END:
+            self._finished = True
+            raise StopIteration
+        if isinstance(item, _StreamError):
+            self._finished = True
+            raise item.error
+        return item
+
+    def close(self):
+        """Stop the job at its next emit; safe to call more than once."""
+        self._cancelled.set()
+
+
+def _limit_torch_threads(workers):
+    # Split the cores between workers instead of letting every job
+    # spawn one intra-op thread per core.
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers))
+
+
+inference_pool = InferencePool()
+classifier_pool = InferencePool(
+    workers=CLASSIFIER_WORKERS,
+    max_queue=CLASSIFIER_MAX_QUEUE,
+    timeout=CLASSIFIER_TIMEOUT,
+    name="classifier",
+    limit_threads=False,
+)
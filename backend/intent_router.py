@@ -1,8 +1,10 @@
 import json
 import os
+import re
+import threading
 from typing import List, Dict
 
-from services.rag import rag_answer
+import numpy as np
 
 # ---------------- PATH SETUP (FIXED) ----------------
 CURRENT_FILE = os.path.abspath(__file__)          # backend/intent_router.py
@@ -14,51 +16,325 @@ PORTAL_REGISTRY_PATH = os.path.join(
     "portal_registry.json"
 )
 
+# ---------------- SQL KEYWORDS ----------------
+# keyword -> students column it refers to
+SQL_KEYWORDS = {
+    "name": "name",
+    "cgpa": "cgpa",
+    "branch": "branch",
+    "placed": "company_placed",
+    "placement rate": "company_placed",
+    "placement": "company_placed",
+    "roll": "roll_no",
+    "female": "gender",
+    "male": "gender",
+}
+
+# These also appear in general questions ("name of the principal",
+# "which branches are offered", "tell me about placements"). When they
+# are the only SQL signal the keyword route is treated as ambiguous.
+WEAK_SQL_KEYWORDS = {"name", "branch", "placement"}
+
+# Any of these next to a weak keyword makes it a student lookup after all:
+# a branch code ("IT" only in capitals, "it" is a pronoun), a company,
+# a number, or a count / list verb.
+STUDENT_SIGNAL_RE = re.compile(
+    r"\b(cse|ece|eee|csd|csm|mech|civil)\b"
+    r"|\bplaced\s+(in|at|with)\s+\w+"
+    r"|\d"
+    r"|\b(how many|count|number of|list|show|give me|find)\b",
+    re.IGNORECASE
+)
+IT_BRANCH_RE = re.compile(r"\bIT\b")
+
+# ---------------- INTENT CLASSIFIER CONFIG ----------------
+# Second stage, run only for ambiguous keyword matches: the query
+# embedding is compared with prototype questions for each intent.
+INTENT_CLASSIFIER_ENABLED = os.getenv("INTENT_CLASSIFIER", "1") == "1"
+INTENT_MIN_MARGIN = float(os.getenv("INTENT_MIN_MARGIN", "0.03"))
+
+INTENT_EXAMPLES = {
+    "sql": [
+        "list the names of students in cse",
+        "show students with cgpa above 8",
+        "how many students were placed in tcs",
+        "number of female students in ece branch",
+        "give me the roll numbers of placed students",
+        "which students from it branch got placed",
+        "placements per company per year",
+        "branch wise placement rate",
+        "average cgpa of placed cse students",
+        "students with highest cgpa in each branch",
+        "name of the student with roll number 21k91a0501",
+    ],
+    "rag": [
+        "what is the name of the college principal",
+        "which branches are offered by the college",
+        "what is the fee structure for btech",
+        "how do i apply for admission",
+        "what is the eamcet code of the college",
+        "tell me about the placement cell",
+        "what facilities does the campus have",
+        "who is the head of the cse department",
+    ],
+}
+
+
+# ---------------- COMPILED MATCHER ----------------
+class KeywordMatcher:
+    """
+    Every SQL keyword and portal keyword compiled into one regex, so a
+    query is scanned once for all of them.
+
+    Keywords match whole words only ("male" no longer matches inside
+    "female", "name" not inside "rename"); a trailing plural "s"/"es" is
+    allowed. The pattern is a lookahead, so matches starting at every
+    word boundary are found even when they overlap ("exam timetable"
+    also yields "timetable").
+    """
+
+    def __init__(self, portals: Dict, sql_keywords: Dict[str, str]):
+        self.portals = portals
+
+        # keyword -> [("sql", column) | ("portal", portal_key), ...]
+        targets = {}
+        for kw, column in sql_keywords.items():
+            targets.setdefault(kw.lower(), []).append(("sql", column))
+        for key, portal in portals.items():
+            for kw in portal["keywords"]:
+                targets.setdefault(kw.lower(), []).append(("portal", key))
+
+        # Only the longest keyword at a position is reported, so a match
+        # also carries the targets of keywords that are its word prefix
+        # ("credits report" -> "credits").
+        self.targets = {}
+        for kw in targets:
+            merged = list(targets[kw])
+            for other in targets:
+                if other != kw and kw.startswith(other + " "):
+                    merged += [t for t in targets[other] if t not in merged]
+            self.targets[kw] = merged
+
+        keywords = sorted(self.targets, key=len, reverse=True)
+        alternation = "|".join(re.escape(kw) for kw in keywords)
+        self.pattern = re.compile(rf"\b(?=({alternation})(?:e?s)?\b)") if keywords else None
+
+        # Navigation prototypes come from the registry itself
+        self.examples = dict(INTENT_EXAMPLES)
+        self.examples["navigation"] = [
+            text.lower()
+            for portal in portals.values()
+            for text in portal["capabilities"]
+        ]
+        self._prototypes = None
+        self._prototype_lock = threading.Lock()
+
+    def scan(self, query: str) -> Dict:
+        """
+        Returns {"intent", "portals", "sql_attributes", "keywords",
+        "ambiguous"} from one pass over the query.
+
+        Intent priority:
+        1. SQL
+        2. Navigation
+        3. RAG
+        """
+        portal_keys = []
+        attributes = []
+        keywords = []
+
+        if self.pattern is not None:
+            for m in self.pattern.finditer(query.lower()):
+                kw = m.group(1)
+                if kw not in keywords:
+                    keywords.append(kw)
+                for kind, target in self.targets[kw]:
+                    if kind == "sql":
+                        if target not in attributes:
+                            attributes.append(target)
+                    elif target not in portal_keys:
+                        portal_keys.append(target)
+
+        if attributes:
+            intent = "sql"
+        elif portal_keys:
+            intent = "navigation"
+        else:
+            intent = "rag"
+
+        # Portals in registry order, like the old per-portal loop
+        portals = [
+            {
+                "label": portal["label"],
+                "url": portal["url"],
+                "capabilities": portal["capabilities"]
+            }
+            for key, portal in self.portals.items()
+            if key in portal_keys
+        ]
+
+        return {
+            "intent": intent,
+            "portals": portals,
+            "sql_attributes": attributes,
+            "keywords": keywords,
+            "ambiguous": is_ambiguous(query, keywords, attributes, portal_keys),
+        }
+
+    # ---------------- PROTOTYPES ----------------
+    def prototypes(self) -> Dict:
+        """
+        intent -> unit-length example embeddings. Encoded in one batch on
+        first use and kept until the registry is reloaded.
+        """
+        if self._prototypes is None:
+            with self._prototype_lock:
+                if self._prototypes is None:
+                    from services.model_registry import get_embedder
+
+                    names = list(self.examples)
+                    texts = [t for name in names for t in self.examples[name]]
+                    vectors = get_embedder().encode(texts, normalize_embeddings=True)
+
+                    prototypes, offset = {}, 0
+                    for name in names:
+                        n = len(self.examples[name])
+                        prototypes[name] = np.asarray(vectors[offset:offset + n], dtype=np.float32)
+                        offset += n
+                    self._prototypes = prototypes
+        return self._prototypes
+
+    def classify(self, query: str, candidates) -> Dict:
+        """
+        Scores each candidate intent by the best cosine similarity between
+        the query and its prototypes. The query goes through
+        rag.embed_query, so retrieval later reuses the cached vector.
+        """
+        from services.rag import embed_query
+
+        query_emb = np.asarray(embed_query(query), dtype=np.float32)
+        prototypes = self.prototypes()
+        return {
+            name: float(np.max(prototypes[name] @ query_emb))
+            for name in candidates
+            if len(prototypes.get(name, ()))
+        }
+
+
+def has_student_signal(query: str) -> bool:
+    return STUDENT_SIGNAL_RE.search(query) is not None or IT_BRANCH_RE.search(query) is not None
+
+
+def is_ambiguous(query, keywords, attributes, portal_keys) -> bool:
+    """
+    The keyword route is ambiguous when both SQL and portal keywords
+    matched, or when the only SQL signal is a weak keyword with nothing
+    else pointing at student records ("name of the principal", but not
+    "list students in ece branch").
+    """
+    if attributes and portal_keys:
+        return True
+    if attributes:
+        weak_only = all(kw in WEAK_SQL_KEYWORDS for kw in keywords if kw in SQL_KEYWORDS)
+        return weak_only and not has_student_signal(query)
+    return False
+
+
 # ---------------- LOAD PORTAL REGISTRY ----------------
-with open(PORTAL_REGISTRY_PATH, "r", encoding="utf-8") as f:
-    PORTALS = json.load(f)
+# Reloaded whenever portal_registry.json changes on disk
+_registry_state = {"mtime": None, "matcher": None}
+_registry_lock = threading.Lock()
 
-# ---------------- SQL KEYWORDS ----------------
-SQL_KEYWORDS = [
-    "name", "cgpa", "branch", "placed",
-    "roll", "female", "male"
-]
 
-# ---------------- INTENT DETECTOR ----------------
-def detect_intent(query: str) -> str:
+def get_matcher() -> KeywordMatcher:
+    try:
+        mtime = os.path.getmtime(PORTAL_REGISTRY_PATH)
+    except OSError:
+        mtime = None
+
+    if _registry_state["matcher"] is not None and mtime == _registry_state["mtime"]:
+        return _registry_state["matcher"]
+
+    with _registry_lock:
+        if _registry_state["matcher"] is None or mtime != _registry_state["mtime"]:
+            try:
+                with open(PORTAL_REGISTRY_PATH, "r", encoding="utf-8") as f:
+                    portals = json.load(f)
+            except (OSError, ValueError) as e:
+                # Keep serving the last good registry if an edit is half-written
+                if _registry_state["matcher"] is not None:
+                    print(f"⚠ Portal registry reload failed, keeping previous: {e}")
+                    return _registry_state["matcher"]
+                raise
+
+            _registry_state["matcher"] = KeywordMatcher(portals, SQL_KEYWORDS)
+            _registry_state["mtime"] = mtime
+
+    return _registry_state["matcher"]
+
+
+# ---------------- ROUTER ----------------
+_classifier_stats = {"runs": 0, "overrides": 0, "kept": 0}
+
+
+def scan_query(query: str) -> Dict:
+    """Keyword stage only: intent, matched portals and SQL attributes in one pass."""
+    route = get_matcher().scan(query)
+    route["classifier_scores"] = None
+    return route
+
+
+def needs_classifier(route: Dict) -> bool:
+    return INTENT_CLASSIFIER_ENABLED and route["ambiguous"]
+
+
+def classify_route(query: str, route: Dict) -> Dict:
     """
-    Priority:
-    1. SQL
-    2. Navigation
-    3. RAG
+    Settles an ambiguous keyword route with the embedding classifier,
+    choosing among rag and the intents whose keywords matched. The
+    keyword intent is kept unless another candidate wins by
+    INTENT_MIN_MARGIN.
     """
-    q = query.lower()
+    candidates = ["rag"]
+    if route["sql_attributes"]:
+        candidates.append("sql")
+    if route["portals"]:
+        candidates.append("navigation")
+
+    scores = get_matcher().classify(query, candidates)
+    route["classifier_scores"] = {k: round(v, 4) for k, v in scores.items()}
+    _classifier_stats["runs"] += 1
 
-    for k in SQL_KEYWORDS:
-        if k in q:
-            return "sql"
+    ranked = sorted(scores, key=lambda k: -scores[k])
+    if len(ranked) > 1 and scores[ranked[0]] - scores[ranked[1]] >= INTENT_MIN_MARGIN \
+            and ranked[0] != route["intent"]:
+        route["intent"] = ranked[0]
+        _classifier_stats["overrides"] += 1
+    else:
+        _classifier_stats["kept"] += 1
 
-    for portal in PORTALS.values():
-        for kw in portal["keywords"]:
-            if kw in q:
-                return "navigation"
+    return route
 
-    return "rag"
+
+def route_query(query: str) -> Dict:
+    """Keyword stage, plus the classifier when the keywords are ambiguous."""
+    route = scan_query(query)
+    if needs_classifier(route):
+        route = classify_route(query, route)
+    return route
+
+
+def classifier_stats() -> dict:
+    return {"enabled": INTENT_CLASSIFIER_ENABLED, **_classifier_stats}
+
+
+# ---------------- INTENT DETECTOR ----------------
+# Keyword stage only: these never load the embedder. Use route_query for
+# the classifier-backed route.
+def detect_intent(query: str) -> str:
+    return scan_query(query)["intent"]
 
 
 # ---------------- PORTAL MATCHER ----------------
 def match_portals(query: str) -> List[Dict]:
-    q = query.lower()
-    matched = []
-
-    for portal in PORTALS.values():
-        for kw in portal["keywords"]:
-            if kw in q:
-                matched.append({
-                    "label": portal["label"],
-                    "url": portal["url"],
-                    "capabilities": portal["capabilities"]
-                })
-                break
-
-    return matched
+    return scan_query(query)["portals"]
@@ -1,12 +1,29 @@
 from fastapi import FastAPI
+from starlette.background import BackgroundTask
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
+import asyncio
+import json
+import os
+import secrets
 import uuid
 
-from backend.intent_router import detect_intent
-from backend.state_manager import set_state, clear_state
-from database.sql.sql_retrevial import handle_user_query as sql_handler
-from services.rag import rag_answer
+from backend.inference_pool import PoolSaturated, classifier_pool, inference_pool
+from backend.intent_router import classifier_stats, classify_route, needs_classifier, scan_query
+from backend.metrics import route_metrics, timed_route
+from backend.state_manager import get_state, session_stats, set_state, clear_state
+from database.sql.query_planner import plan_cache_stats
+from database.sql.sql_retrevial import handle_user_query as sql_handler, stream_rows
+from services import batcher, model_registry
+from services import conversation
+from services.answer_cache import answer_cache
+from services.rag import context_stats, embedding_cache_stats, rag_answer_detailed, rag_answer_stream
+
+# Set RAG_WARMUP=1 to load all models in the background at startup.
+# Without it, each model loads on the first request that needs it.
+RAG_WARMUP = os.getenv("RAG_WARMUP", "0") == "1"
 
 
 app = FastAPI(title="College Hybrid Backend")
@@ -26,19 +43,157 @@ class QueryRequest(BaseModel):
     session_id: str | None = None
 
 
-# -------- Health Check --------
+class MoreRequest(BaseModel):
+    session_id: str
+    token: str
+
+
+# -------- Startup Warm-up --------
+@app.on_event("startup")
+def start_warmup():
+    if RAG_WARMUP:
+        model_registry.warmup_in_background()
+
+
+# -------- Health Check (liveness) --------
 @app.get("/")
 def health():
     return {"status": "Backend running successfully"}
 
 
+# -------- Readiness --------
+@app.get("/ready")
+def ready():
+    status = model_registry.status()
+    return JSONResponse(
+        status_code=200 if status["ready"] else 503,
+        content=status
+    )
+
+
+# -------- Metrics --------
+@app.get("/metrics")
+def metrics():
+    return {
+        "batching": batcher.stats(),
+        "embedding_cache": embedding_cache_stats(),
+        "answer_cache": answer_cache.stats(),
+        "inference_pool": inference_pool.stats(),
+        "classifier_pool": classifier_pool.stats(),
+        "context": context_stats(),
+        "routes": route_metrics.stats(),
+        "intent_classifier": classifier_stats(),
+        "sessions": session_stats(),
+        "conversation": conversation.conversation_stats(),
+        "sql_planner": plan_cache_stats()
+    }
+
+
+# -------- Routing --------
+async def resolve_route(user_query):
+    """
+    Keyword routing, plus the embedding classifier for ambiguous
+    matches. The classifier runs in its own small pool with a short
+    timeout (CLASSIFIER_TIMEOUT), never behind generations; if that pool
+    is full, the call times out or the embedder fails, the keyword route
+    stands. A cold first call usually times out and warms the embedder
+    for the next one.
+    """
+    route = scan_query(user_query)
+    if not needs_classifier(route):
+        return route
+
+    try:
+        # The query embedding is reused by retrieval on the RAG path
+        return await classifier_pool.run(classify_route, user_query, dict(route))
+    except (PoolSaturated, asyncio.TimeoutError) as e:
+        print(f"⚠ Intent classifier skipped: {e!r}")
+    except Exception as e:
+        print(f"❌ Intent classifier failed: {e}")
+    return route
+
+
+# -------- Navigation --------
+def navigation_answer(portals):
+    """Portal links straight from portal_registry.json; no model involved."""
+    lines = ["You can find this on the following portal(s):"]
+    for p in portals:
+        lines.append(f"- {p['label']}: {p['url']}")
+    return "\n".join(lines)
+
+
+def portal_sources(portals):
+    # Same shape as rag.source_summary so clients render them as links
+    return [
+        {"type": "portal", "label": p["label"], "source_url": p["url"],
+         "capabilities": p["capabilities"]}
+        for p in portals
+    ]
+
+
+# -------- Conversation --------
+def session_rag_answer(session_id, user_query):
+    """RAG answer with the session's history; records the turn."""
+    state = get_state(session_id)
+    turn = conversation.prepare_turn(user_query, state)
+
+    result = rag_answer_detailed(turn["standalone"], turn["history"], turn["reuse_evidence"],
+                                 turn["follow_up"])
+
+    set_state(session_id, conversation.record_turn(state, turn, result))
+    return result
+
+
+# -------- SQL Pagination --------
+# Continuation tokens are opaque; the query and keyset position they
+# stand for stay in the session. Only the latest few are kept.
+MAX_PAGE_TOKENS = 5
+
+
+def remember_page(session_id, query, next_after, previous_token=None):
+    """Stores where the next page starts; returns its token (None on the last page)."""
+    state = dict(get_state(session_id) or {})
+    pages = dict(state.get("sql_pages") or {})
+    pages.pop(previous_token, None)
+
+    token = None
+    if next_after is not None:
+        token = secrets.token_urlsafe(12)
+        pages[token] = {"query": query, "after": next_after}
+        pages = dict(list(pages.items())[-MAX_PAGE_TOKENS:])
+
+    state["sql_pages"] = pages
+    set_state(session_id, state)
+    return token
+
+
+def sql_answer(session_id, user_query):
+    result = sql_handler(user_query)
+    if result.get("status") == "need_more_info":
+        return result["message"], None
+
+    token = remember_page(session_id, user_query, result.get("next_after"))
+    return result.get("answer", "No result found."), token
+
+
 # -------- Main Chat Endpoint --------
 @app.post("/query")
-def query_router(req: QueryRequest):
+async def query_router(req: QueryRequest):
     session_id = req.session_id or str(uuid.uuid4())
     user_query = req.message
 
-    intent = detect_intent(user_query)
+    route = await resolve_route(user_query)
+    intent = route["intent"]
+
+    # -------- Navigation --------
+    if intent == "navigation":
+        with timed_route("navigation"):
+            return {
+                "answer": navigation_answer(route["portals"]),
+                "portals": route["portals"],
+                "source": "navigation",
+                "session_id": session_id
+            }
 
     # -------- SQL --------
     """
@@ -59,23 +214,176 @@ def query_router(req: QueryRequest):
         }
     """
     if intent == "sql":
-        result = sql_handler(user_query)
-
-        if result.get("status") == "need_more_info":
-            return {
-                "answer": result["message"],
-                "session_id": session_id
-            }
+        # Fast lane: SQL never waits behind model work
+        with timed_route("sql"):
+            answer, more_token = await run_in_threadpool(sql_answer, session_id, user_query)
 
         return {
-            "answer": result.get("answer", "No result found."),
+            "answer": answer,
+            "more_token": more_token,
             "session_id": session_id
         }
     
     # -------- RAG --------
-    answer, _ = rag_answer(user_query)
+    try:
+        with timed_route("rag"):
+            result = await inference_pool.run(session_rag_answer, session_id, user_query)
+    except PoolSaturated as e:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={
+                "answer": "The assistant is busy right now. Please try again in a moment.",
+                "session_id": session_id
+            }
+        )
+    except asyncio.TimeoutError:
+        return JSONResponse(
+            status_code=504,
+            content={
+                "answer": "Sorry, that took too long. Please try again.",
+                "session_id": session_id
+            }
+        )
 
     return {
-        "answer": answer,
+        "answer": result["answer"],
+        "source": result["source"],
         "session_id": session_id
     }
+
+
+
+# -------- Streaming Chat Endpoint --------
+def ndjson(events):
+    for event in events:
+        yield json.dumps(event, ensure_ascii=False) + "\n"
+
+
+def pool_events(stream, session_id):
+    # Pool slot accounting lives in the pool; this only stops the job
+    # when the client goes away and turns a timeout into a final event.
+    with timed_route("rag"):
+        try:
+            yield from stream
+        except TimeoutError:
+            yield {
+                "type": "error",
+                "answer": "Sorry, that took too long. Please try again.",
+                "session_id": session_id
+            }
+        finally:
+            stream.close()
+
+
+@app.post("/query/stream")
+async def query_stream(req: QueryRequest):
+    """
+    NDJSON stream: one `sources` event, then `token` events as the answer
+    is generated, then a final `done` event. SQL and navigation answers
+    arrive as a single token.
+    """
+    session_id = req.session_id or str(uuid.uuid4())
+    user_query = req.message
+
+    route = await resolve_route(user_query)
+    intent = route["intent"]
+
+    if intent == "navigation":
+        with timed_route("navigation"):
+            answer = navigation_answer(route["portals"])
+            events = [
+                {"type": "sources", "sources": portal_sources(route["portals"]), "session_id": session_id},
+                {"type": "token", "text": answer},
+                {"type": "done", "answer": answer, "source": "navigation", "session_id": session_id},
+            ]
+        return StreamingResponse(ndjson(events), media_type="application/x-ndjson")
+
+    if intent == "sql":
+        with timed_route("sql"):
+            answer, more_token = await run_in_threadpool(sql_answer, session_id, user_query)
+
+        events = [
+            {"type": "sources", "sources": [], "session_id": session_id},
+            {"type": "token", "text": answer},
+            {"type": "done", "answer": answer, "source": "sql",
+             "more_token": more_token, "session_id": session_id},
+        ]
+        return StreamingResponse(ndjson(events), media_type="application/x-ndjson")
+
+    def rag_job(emit):
+        # Runs on an inference worker, generation included
+        state = get_state(session_id)
+        turn = conversation.prepare_turn(user_query, state)
+
+        def on_finish(result):
+            set_state(session_id, conversation.record_turn(state, turn, result))
+
+        def tagged(event):
+            if event["type"] in ("sources", "done"):
+                event["session_id"] = session_id
+            emit(event)
+
+        rag_answer_stream(turn["standalone"], tagged, turn["history"],
+                          turn["reuse_evidence"], turn["follow_up"], on_finish=on_finish)
+
+    try:
+        stream = inference_pool.stream(rag_job)
+    except PoolSaturated as e:
+        return JSONResponse(
+            status_code=429,
+            headers={"Retry-After": str(e.retry_after)},
+            content={
+                "answer": "The assistant is busy right now. Please try again in a moment.",
+                "session_id": session_id
+            }
+        )
+
+    return StreamingResponse(
+        ndjson(pool_events(stream, session_id)),
+        media_type="application/x-ndjson",
+        # Also runs when the client disconnects before the body starts
+        background=BackgroundTask(stream.close)
+    )
+
+
+# -------- SQL: next page --------
+@app.post("/query/more")
+async def query_more(req: MoreRequest):
+    state = get_state(req.session_id) or {}
+    page = (state.get("sql_pages") or {}).get(req.token)
+
+    if page is None:
+        return JSONResponse(
+            status_code=410,
+            content={
+                "answer": "These results have expired. Please ask the question again.",
+                "session_id": req.session_id
+            }
+        )
+
+    def next_page():
+        result = sql_handler(page["query"], after=page["after"])
+        token = remember_page(req.session_id, page["query"], result.get("next_after"), req.token)
+        return result.get("answer", "No more students."), token
+
+    with timed_route("sql"):
+        answer, more_token = await run_in_threadpool(next_page)
+
+    return {
+        "answer": answer,
+        "more_token": more_token,
+        "session_id": req.session_id
+    }
+
+
+# -------- SQL: all rows, streamed --------
+@app.post("/query/rows")
+def query_rows(req: QueryRequest):
+    """
+    NDJSON stream of every matching student row: a `columns` event,
+    one `row` event per student, then `done` with the count. Rows are
+    read from the cursor in batches, so memory does not grow with the
+    result size.
+    """
+    return StreamingResponse(ndjson(stream_rows(req.message)), media_type="application/x-ndjson")
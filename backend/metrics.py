@@ -0,0 +1,62 @@
+import threading
+import time
+
+# Routes that answer without embedding, reranking or generating
+MODEL_FREE_ROUTES = ("sql", "navigation")
+
+
+# ---------------- ROUTE METRICS ----------------
+class RouteMetrics:
+    """
+    Request counts and handler latency per route ("sql", "navigation",
+    "rag"), plus the share of traffic that never reaches the models.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes = {}
+
+    def record(self, route: str, seconds: float):
+        with self._lock:
+            entry = self._routes.setdefault(route, {"requests": 0, "total_ms": 0.0, "max_ms": 0.0})
+            ms = seconds * 1000.0
+            entry["requests"] += 1
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+
+    def stats(self) -> dict:
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": e["requests"],
+                    "avg_ms": round(e["total_ms"] / e["requests"], 3),
+                    "max_ms": round(e["max_ms"], 3),
+                }
+                for route, e in self._routes.items()
+            }
+
+        total = sum(r["requests"] for r in routes.values())
+        model_free = sum(routes[r]["requests"] for r in MODEL_FREE_ROUTES if r in routes)
+        return {
+            "requests": total,
+            "model_free_share": round(model_free / total, 4) if total else 0.0,
+            "routes": routes,
+        }
+
+
+route_metrics = RouteMetrics()
+
+
+class timed_route:
+    """Records the time spent in the block under `route`."""
+
+    def __init__(self, route: str):
+        self.route = route
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        route_metrics.record(self.route, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,265 @@
+"""
+Per-session state for the chat endpoints.
+
+Two interchangeable backends:
+
+    memory  in-process LRU + TTL, the default for a single worker
+    sqlite  one shared SQLite file, for several uvicorn workers
+
+Pick one with SESSION_BACKEND. Both bound the number of sessions kept
+and expire sessions that have been idle for SESSION_TTL seconds.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+# ---------------- PATH SETUP ----------------
+CURRENT_FILE = os.path.abspath(__file__)          # backend/session_store.py
+BACKEND_DIR = os.path.dirname(CURRENT_FILE)       # backend/
+PROJECT_ROOT = os.path.dirname(BACKEND_DIR)       # project_bot/
+
+# ---------------- CONFIG ----------------
+SESSION_BACKEND = os.getenv("SESSION_BACKEND", "memory")
+SESSION_MAX = int(os.getenv("SESSION_MAX", "10000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", "1800"))
+SESSION_DB_PATH = os.getenv("SESSION_DB_PATH", os.path.join(PROJECT_ROOT, "sessions.db"))
+
+
+# ---------------- INTERFACE ----------------
+class SessionStore(ABC):
+    """
+    get / set / delete JSON-serializable state by session id.
+    Reading or writing a session refreshes its TTL.
+    """
+
+    @abstractmethod
+    def get(self, session_id):
+        ...
+
+    @abstractmethod
+    def set(self, session_id, state):
+        ...
+
+    @abstractmethod
+    def delete(self, session_id):
+        ...
+
+    @abstractmethod
+    def stats(self) -> dict:
+        ...
+
+
+# ---------------- MEMORY ----------------
+class MemorySessionStore(SessionStore):
+    """
+    OrderedDict in least-recently-used order. Every access refreshes the
+    TTL and moves the session to the end, so the front is always both the
+    LRU entry and the next one to expire. Expiry therefore only ever pops
+    from the front: O(1) per removed session, no scan.
+    """
+
+    def __init__(self, max_size=SESSION_MAX, ttl=SESSION_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+
+        self._data = OrderedDict()       # session_id -> (expires_at, state)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _expire(self, now):
+        while self._data:
+            session_id, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now:
+                break
+            self._data.popitem(last=False)
+            self.expirations += 1
+
+    def get(self, session_id):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._data.get(session_id)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._data[session_id] = (now + self.ttl, entry[1])
+            self._data.move_to_end(session_id)
+            return entry[1]
+
+    def set(self, session_id, state):
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            self._data[session_id] = (now + self.ttl, state)
+            self._data.move_to_end(session_id)
+
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, session_id):
+        with self._lock:
+            self._data.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.monotonic())
+            return {
+                "backend": "memory",
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# ---------------- SQLITE ----------------
+class SQLiteSessionStore(SessionStore):
+    """
+    Sessions as JSON rows in one SQLite file shared by every worker.
+
+    One connection per thread; WAL lets readers run alongside a writer.
+    Expired rows are removed on a timer, and when the table grows past
+    `max_size` the least recently used sessions are dropped.
+    """
+
+    def __init__(self, db_path=SESSION_DB_PATH, max_size=SESSION_MAX, ttl=SESSION_TTL,
+                 purge_interval=30.0):
+        self.db_path = db_path
+        self.max_size = max_size
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+
+        self._local = threading.local()
+        # Guards the purge timer and the counters shared by request threads
+        self._lock = threading.Lock()
+        self._last_purge = 0.0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        with self._conn() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS sessions (
+                    session_id TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=5.0)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _maybe_purge(self, conn, now):
+        # Wall-clock time: expiry must agree across processes
+        if now - self._last_purge < self.purge_interval:
+            return
+        with self._lock:
+            if now - self._last_purge < self.purge_interval:
+                return
+            self._last_purge = now
+
+        with conn:
+            expired = conn.execute("DELETE FROM sessions WHERE expires_at <= ?", (now,)).rowcount
+            over = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0] - self.max_size
+            evicted = 0
+            if over > 0:
+                evicted = conn.execute("""
+                    DELETE FROM sessions WHERE session_id IN (
+                        SELECT session_id FROM sessions ORDER BY expires_at LIMIT ?
+                    )
+                """, (over,)).rowcount
+
+        with self._lock:
+            self.expirations += expired
+            self.evictions += evicted
+
+    def get(self, session_id):
+        now = time.time()
+        conn = self._conn()
+        self._maybe_purge(conn, now)
+
+        row = conn.execute(
+            "SELECT state FROM sessions WHERE session_id = ? AND expires_at > ?",
+            (session_id, now)
+        ).fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if row is None:
+            return None
+
+        with conn:
+            conn.execute(
+                "UPDATE sessions SET expires_at = ? WHERE session_id = ?",
+                (now + self.ttl, session_id)
+            )
+        return json.loads(row[0])
+
+    def set(self, session_id, state):
+        now = time.time()
+        conn = self._conn()
+        self._maybe_purge(conn, now)
+
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO sessions (session_id, state, expires_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(state, ensure_ascii=False), now + self.ttl)
+            )
+
+    def delete(self, session_id):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    def stats(self) -> dict:
+        size = self._conn().execute(
+            "SELECT COUNT(*) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()[0]
+        with self._lock:
+            return {
+                "backend": "sqlite",
+                "size": size,
+                "max_size": self.max_size,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+# ---------------- FACTORY ----------------
+def create_store(backend=SESSION_BACKEND) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore()
+    if backend == "sqlite":
+        return SQLiteSessionStore()
+    raise ValueError(f"Unknown SESSION_BACKEND: {backend!r} (expected 'memory' or 'sqlite')")
+
+
+session_store = create_store()
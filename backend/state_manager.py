@@ -1,10 +1,15 @@
-SESSION_STATE = {}
+from backend.session_store import session_store
+
+# Bounded, expiring store (see backend/session_store.py)
 
 def get_state(sid):
-    return SESSION_STATE.get(sid)
+    return session_store.get(sid)
 
 def set_state(sid, state):
-    SESSION_STATE[sid] = state
+    session_store.set(sid, state)
 
 def clear_state(sid):
-    SESSION_STATE.pop(sid, None)
+    session_store.delete(sid)
+
+def session_stats():
+    return session_store.stats()
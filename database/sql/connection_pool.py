@@ -0,0 +1,105 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# ---------------- PATH ----------------
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
+DB_PATH = os.getenv("STUDENTS_DB_PATH", os.path.join(PROJECT_ROOT, "students.db"))
+
+# ---------------- CONFIG ----------------
+SQLITE_POOL_SIZE = int(os.getenv("SQLITE_POOL_SIZE", "4"))
+# Bytes of the DB file to memory-map (0 disables mmap)
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(64 * 1024 * 1024)))
+# Prepared statements kept per connection
+SQLITE_STATEMENT_CACHE = 128
+# Seconds to wait for a connection when all are in use
+SQLITE_ACQUIRE_TIMEOUT = float(os.getenv("SQLITE_ACQUIRE_TIMEOUT", "5"))
+
+
+# ---------------- POOL ----------------
+class SQLitePool:
+    """
+    Thread-safe pool of persistent, read-only SQLite connections.
+
+    Connections are opened lazily up to `size` and reused, so SQLite's
+    per-connection statement cache keeps the query plans prepared between
+    requests. WAL mode is enabled on the database by init_student.py,
+    which lets these readers run alongside a refresh.
+    """
+
+    def __init__(self, db_path, size=SQLITE_POOL_SIZE, mmap_size=SQLITE_MMAP_SIZE,
+                 acquire_timeout=SQLITE_ACQUIRE_TIMEOUT):
+        self.db_path = db_path
+        self.size = size
+        self.mmap_size = mmap_size
+        self.acquire_timeout = acquire_timeout
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._opened = 0
+
+    def _connect(self):
+        conn = sqlite3.connect(
+            f"file:{self.db_path}?mode=ro",
+            uri=True,
+            check_same_thread=False,
+            cached_statements=SQLITE_STATEMENT_CACHE
+        )
+        conn.execute("PRAGMA query_only = ON")
+        if self.mmap_size:
+            conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size)}")
+        return conn
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._opened < self.size:
+                self._opened += 1
+                try:
+                    return self._connect()
+                except Exception:
+                    self._opened -= 1
+                    raise
+
+        # Pool exhausted: wait for a connection to come back
+        try:
+            return self._idle.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"no SQLite connection free after {self.acquire_timeout}s"
+            ) from None
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close_all(self):
+        with self._lock:
+            while True:
+                try:
+                    self._idle.get_nowait().close()
+                except queue.Empty:
+                    break
+                self._opened -= 1
+
+    def stats(self) -> dict:
+        return {
+            "size": self.size,
+            "opened": self._opened,
+            "idle": self._idle.qsize(),
+        }
+
+
+# Shared by every student-lookup handler
+student_pool = SQLitePool(DB_PATH)
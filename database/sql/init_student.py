@@ -1,6 +1,9 @@
 import pandas as pd
+import hashlib
+import re
 import sqlite3
 import os
+import sys
 
 # -----------------------------
 # PATH SETUP (100% CORRECT)
@@ -10,10 +13,15 @@ SQL_DIR = os.path.dirname(CURRENT_FILE)           # project_bot/database/sql
 DATABASE_DIR = os.path.dirname(SQL_DIR)            # project_bot/database
 PROJECT_ROOT = os.path.dirname(DATABASE_DIR)       # project_bot
 
-DB_PATH = os.path.join(
+DB_PATH = os.getenv("STUDENTS_DB_PATH", os.path.join(
     PROJECT_ROOT,
     "students.db"
-)
+))
+
+# PRAGMA user_version written by this script. Bumped when normalization
+# or derived tables change, so existing databases are rebuilt even when
+# the Excel file has not changed.
+SCHEMA_VERSION = 3
 
 EXCEL_PATH = os.path.join(
     PROJECT_ROOT,
@@ -28,6 +36,42 @@ EXCEL_PATH = os.path.join(
 if not os.path.exists(EXCEL_PATH):
     raise FileNotFoundError(f"❌ Excel file not found: {EXCEL_PATH}")
 
+# -----------------------------
+# CHANGE DETECTION
+# -----------------------------
+# The source hash is stored with the data; an unchanged Excel file on the
+# current SCHEMA_VERSION skips the reload and rollup rebuild. Pass
+# --force to rebuild anyway.
+def file_hash(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def stored_source_hash(db_path):
+    """Source hash of an existing database, or None if it must be rebuilt."""
+    if not os.path.exists(db_path):
+        return None
+    conn = sqlite3.connect(db_path)
+    try:
+        if conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            return None
+        row = conn.execute("SELECT value FROM source_meta WHERE key = 'excel_sha256'").fetchone()
+        return row[0] if row else None
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+
+
+SOURCE_HASH = file_hash(EXCEL_PATH)
+
+if "--force" not in sys.argv and stored_source_hash(DB_PATH) == SOURCE_HASH:
+    print("✅ students.db is up to date with", os.path.basename(EXCEL_PATH))
+    sys.exit(0)
+
 # -----------------------------
 # LOAD EXCEL DATA
 # -----------------------------
@@ -42,7 +86,8 @@ df.columns = [
 # -----------------------------
 # SQLITE SETUP
 # -----------------------------
-conn = sqlite3.connect(DB_PATH)
+# Autocommit mode; the refresh below manages its own transaction
+conn = sqlite3.connect(DB_PATH, isolation_level=None)
 cur = conn.cursor()
 
 cur.execute("""
@@ -63,17 +108,175 @@ CREATE TABLE IF NOT EXISTS students (
 );
 """)
 
+# Readers use persistent read-only connections; WAL lets them keep
+# reading the previous snapshot while this script refreshes the data.
+cur.execute("PRAGMA journal_mode = WAL")
+
+
+# -----------------------------
+# SCHEMA MIGRATION (v1)
+# -----------------------------
+# Lookups filter on lower-cased gender / company. Storing normalized
+# copies lets those filters use indexes instead of LOWER() scans.
+def migrate(cur):
+    existing = {r[1] for r in cur.execute("PRAGMA table_info(students)")}
+    for col in ["gender_norm", "company_norm"]:
+        if col not in existing:
+            cur.execute(f"ALTER TABLE students ADD COLUMN {col} TEXT")
+
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_students_branch ON students(branch)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_students_gender ON students(gender_norm)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_students_cgpa ON students(cgpa)")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_students_company ON students(company_norm)")
+
+
 # -----------------------------
 # INSERT DATA
 # -----------------------------
-for _, row in df.iterrows():
+STUDENT_COLUMNS = [
+    "roll_no", "name", "gender", "branch", "credits", "cgpa", "result",
+    "degree_name", "email_id", "joining_year", "passed_year", "admission",
+    "company_placed"
+]
+
+# company_placed holds "Not Placed" (or a dash / NA) for students without
+# an offer. company_norm is NULL for all of those, so "placed" is simply
+# company_norm IS NOT NULL.
+NOT_PLACED_VALUES = ("", "not placed", "-", "na", "n/a", "nil", "none")
+
+
+def company_norm_sql(expr):
+    values = ", ".join(f"'{v}'" for v in NOT_PLACED_VALUES)
+    return f"""
+        CASE WHEN LOWER(TRIM(COALESCE({expr}, ''))) IN ({values}) THEN NULL
+             ELSE LOWER(TRIM({expr})) END
+    """
+
+
+# The normalized columns are computed in the INSERT itself, so no row is
+# ever visible without them.
+INSERT_SQL = f"""
+    INSERT OR REPLACE INTO students ({", ".join(STUDENT_COLUMNS)}, gender_norm, company_norm)
+    VALUES (
+        {", ".join("?" for _ in STUDENT_COLUMNS)},
+        LOWER(TRIM(?3)),
+        {company_norm_sql("?13")}
+    )
+"""
+
+
+def load_students(cur, df):
+    cur.executemany(INSERT_SQL, (tuple(row) for row in df.itertuples(index=False)))
+
+    # Re-normalize every row, including rows from earlier loads that are
+    # no longer in the Excel file or were normalized by an older rule
+    cur.execute(f"""
+        UPDATE students SET
+            gender_norm = LOWER(TRIM(gender)),
+            company_norm = {company_norm_sql("company_placed")}
+    """)
+
+
+# -----------------------------
+# COMPANIES (v3)
+# -----------------------------
+# company_placed may list several offers ("Acads360, Qspiders, Savantis").
+# student_companies has one row per student and company, so "placed in
+# Savantis" and per-company counts see every offer, not only students
+# whose whole list is exactly "Savantis". Commas inside parentheses are
+# part of a name.
+COMPANY_SPLIT_RE = re.compile(r",(?![^()]*\))")
+
+
+def split_companies(value):
+    names = []
+    for part in COMPANY_SPLIT_RE.split(value or ""):
+        name = " ".join(part.split())
+        if name.lower() not in NOT_PLACED_VALUES and name.lower() not in (n.lower() for n in names):
+            names.append(name)
+    return names
+
+
+def build_companies(cur):
+    cur.execute("DROP TABLE IF EXISTS student_companies")
     cur.execute("""
-        INSERT OR REPLACE INTO students VALUES (
-            ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?
+        CREATE TABLE student_companies (
+            roll_no TEXT NOT NULL,
+            company TEXT NOT NULL,
+            company_key TEXT NOT NULL,
+            PRIMARY KEY (roll_no, company_key)
         )
-    """, tuple(row))
+    """)
+    rows = cur.execute(
+        "SELECT roll_no, company_placed FROM students WHERE company_norm IS NOT NULL"
+    ).fetchall()
+    cur.executemany(
+        "INSERT INTO student_companies (roll_no, company, company_key) VALUES (?, ?, ?)",
+        [(roll, name, name.lower()) for roll, value in rows for name in split_companies(value)]
+    )
+    cur.execute("CREATE INDEX idx_student_companies_key ON student_companies(company_key)")
+
+
+# -----------------------------
+# ROLLUPS (v2)
+# -----------------------------
+# Aggregate questions ("average CGPA of placed CSE students", "placements
+# per company per year", "branch-wise placement rate") are answered from
+# this pre-aggregated table instead of scanning students. Each row is one
+# combination of the dimensions below with additive measures, so any
+# equality filter / GROUP BY over those dimensions can be re-aggregated
+# from it (see query_planner.ROLLUP_DIMENSIONS). company_norm here is a
+# student's whole offer list; per-company questions use
+# student_companies instead.
+def build_rollups(cur, source_hash):
+    cur.execute("DROP TABLE IF EXISTS students_rollup")
+    cur.execute("""
+        CREATE TABLE students_rollup AS
+        SELECT
+            branch,
+            gender_norm,
+            company_norm,
+            company_placed,
+            joining_year,
+            passed_year,
+            COUNT(*)                           AS n,
+            SUM(company_norm IS NOT NULL)      AS placed_n,
+            COUNT(cgpa)                        AS cgpa_n,
+            SUM(cgpa)                          AS cgpa_sum,
+            MIN(cgpa)                          AS cgpa_min,
+            MAX(cgpa)                          AS cgpa_max
+        FROM students
+        GROUP BY branch, gender_norm, company_norm, company_placed, joining_year, passed_year
+    """)
+    cur.execute("CREATE INDEX idx_rollup_branch ON students_rollup(branch)")
+    cur.execute("CREATE INDEX idx_rollup_company ON students_rollup(company_norm)")
+
+    cur.execute("CREATE TABLE IF NOT EXISTS source_meta (key TEXT PRIMARY KEY, value TEXT)")
+    cur.execute(
+        "INSERT OR REPLACE INTO source_meta (key, value) VALUES ('excel_sha256', ?)",
+        (source_hash,)
+    )
+
+
+# -----------------------------
+# REFRESH (one transaction)
+# -----------------------------
+# Schema, rows, normalized columns and rollup change together: readers
+# see either the old database or the new one, never a half-loaded table
+# or a rollup that disagrees with students.
+cur.execute("BEGIN IMMEDIATE")
+try:
+    migrate(cur)
+    load_students(cur, df)
+    build_companies(cur)
+    build_rollups(cur, SOURCE_HASH)
+    cur.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+    cur.execute("COMMIT")
+except BaseException:
+    cur.execute("ROLLBACK")
+    raise
 
-conn.commit()
+cur.execute("ANALYZE")
 conn.close()
 
 # -----------------------------
@@ -0,0 +1,529 @@
+"""
+Natural-language student questions -> typed filter AST -> parameterized SQL.
+
+    plan = parse_query("how many female CSE students placed in TCS")
+    sql, params = compile_query(plan)
+
+Parsing is memoized per normalized question, and SQL compilation per
+query *shape* (which filters / aggregate / grouping, not their values),
+so repeated shapes such as "students above 8" / "students above 9"
+reuse the same statement text and hit SQLite's prepared-statement cache.
+
+Aggregates whose filters and grouping only use rollup dimensions are
+compiled against the students_rollup table built by init_student.py.
+Company filters and per-company grouping go through student_companies
+(one row per student and offer), since company_placed may list several.
+"""
+import os
+import re
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Optional, Tuple, Union
+
+# ---------------- CONFIG ----------------
+PLAN_CACHE_SIZE = 512
+# Rows per page for listing queries
+SQL_PAGE_SIZE = int(os.getenv("SQL_PAGE_SIZE", "25"))
+USE_ROLLUPS = os.getenv("SQL_USE_ROLLUPS", "1") == "1"
+# PRAGMA user_version from which students_rollup exists with NULL
+# company_norm for unplaced students (older rollups count everyone placed)
+ROLLUP_SCHEMA_VERSION = 3
+# Largest N honoured in "top N" questions
+TOP_N_MAX = 100
+
+# Spoken name -> stored students.branch value. The college has CE, CSE,
+# CSE (AI&ML), CSE (DS), EEE, IT and MECH.
+BRANCHES = {
+    "cse": "CSE", "computer science": "CSE",
+    "cse (ai&ml)": "CSE (AI&ML)", "cse ai&ml": "CSE (AI&ML)", "cse aiml": "CSE (AI&ML)",
+    "csm": "CSE (AI&ML)", "aiml": "CSE (AI&ML)", "ai&ml": "CSE (AI&ML)", "ai ml": "CSE (AI&ML)",
+    "ai & ml": "CSE (AI&ML)",
+    "cse (ds)": "CSE (DS)", "cse ds": "CSE (DS)", "csd": "CSE (DS)", "ds": "CSE (DS)",
+    "data science": "CSE (DS)",
+    "ce": "CE", "civil": "CE",
+    "eee": "EEE", "electrical": "EEE",
+    "mech": "MECH", "mechanical": "MECH",
+    "it": "IT",
+}
+BRANCH_VALUES = sorted(set(BRANCHES.values()))
+# Branches people ask about that the college does not have
+UNKNOWN_BRANCHES = {"ece": "ECE"}
+
+# Columns a question may compare, group or aggregate on
+COLUMNS = {
+    "branch", "gender_norm", "cgpa", "company_norm", "company_placed",
+    "joining_year", "passed_year", "name", "roll_no",
+}
+
+DEFAULT_COLUMNS = ("name", "roll_no", "branch", "cgpa", "company_placed")
+
+# Grouping columns of students_rollup
+ROLLUP_DIMENSIONS = {
+    "branch", "gender_norm", "company_norm", "company_placed", "joining_year", "passed_year",
+}
+
+
+# ---------------- AST ----------------
+@dataclass(frozen=True)
+class Compare:
+    """`column op value`, op one of = > >= < <="""
+    column: str
+    op: str
+    value: Union[str, float, int]
+
+
+@dataclass(frozen=True)
+class Between:
+    column: str
+    low: float
+    high: float
+
+
+@dataclass(frozen=True)
+class IsNull:
+    """`column IS NULL`, or IS NOT NULL when negated."""
+    column: str
+    negated: bool = False
+
+
+@dataclass(frozen=True)
+class HasCompany:
+    """The student has an offer from `company` (lower-cased), via student_companies."""
+    company: str
+
+
+Filter = Union[Compare, Between, IsNull, HasCompany]
+
+
+@dataclass(frozen=True)
+class Ranking:
+    """`ORDER BY column DESC LIMIT limit` ("top 10 students by cgpa")."""
+    column: str
+    limit: int
+    descending: bool = True
+
+
+@dataclass(frozen=True)
+class Aggregate:
+    """
+    func one of count / avg / min / max / placement_rate; column is None
+    for count(*) and placement_rate (percentage placed).
+    """
+    func: str
+    column: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class StudentQuery:
+    filters: Tuple[Filter, ...] = ()
+    aggregate: Optional[Aggregate] = None
+    group_by: Tuple[str, ...] = ()
+    columns: Tuple[str, ...] = DEFAULT_COLUMNS
+    ranking: Optional[Ranking] = None
+    # Set when the question names a branch the college does not have
+    unknown_branch: Optional[str] = None
+
+    @property
+    def empty(self) -> bool:
+        return not (self.filters or self.aggregate or self.group_by or self.ranking)
+
+    def shape(self):
+        """Everything that determines the SQL text, without the values."""
+        return (
+            tuple(_filter_shape(f) for f in self.filters),
+            self.aggregate,
+            self.group_by,
+            self.columns,
+            (self.ranking.column, self.ranking.descending) if self.ranking else None,
+        )
+
+    def params(self):
+        params = []
+        for f in self.filters:
+            if isinstance(f, Compare):
+                params.append(f.value)
+            elif isinstance(f, Between):
+                params += [f.low, f.high]
+            elif isinstance(f, HasCompany):
+                params.append(f.company)
+        if self.ranking:
+            params.append(self.ranking.limit)
+        return params
+
+    def filter_value(self, column):
+        for f in self.filters:
+            if isinstance(f, Compare) and f.column == column and f.op == "=":
+                return f.value
+        return None
+
+
+def _filter_shape(f: Filter):
+    if isinstance(f, Compare):
+        return ("cmp", f.column, f.op)
+    if isinstance(f, Between):
+        return ("between", f.column)
+    if isinstance(f, HasCompany):
+        return ("company", "company")
+    return ("null", f.column, f.negated)
+
+
+# ---------------- PARSER ----------------
+NUM = r"(\d+(?:\.\d+)?)"
+YEAR = r"((?:19|20)\d{2})"
+
+# "it" is usually the pronoun: IT is a branch only in capitals (checked on
+# the raw question) or as "it branch" / "it department"
+# Longest name first, so "cse (ds)" is not read as plain "cse"
+BRANCH_RE = re.compile(
+    r"(?<![a-z0-9])("
+    + "|".join(re.escape(b) for b in sorted(BRANCHES, key=len, reverse=True) if b != "it")
+    + r")(?![a-z0-9])"
+)
+UNKNOWN_BRANCH_RE = re.compile(r"\b(" + "|".join(UNKNOWN_BRANCHES) + r")\b")
+IT_BRANCH_RE = re.compile(r"\bIT\b")
+IT_BRANCH_WORDS_RE = re.compile(r"\bit\s+(branch|department|dept|students)\b")
+FEMALE_RE = re.compile(r"\b(female|females|girls?|women)\b")
+MALE_RE = re.compile(r"\b(male|males|boys?|men)\b")
+
+CGPA_BETWEEN_RE = re.compile(rf"\bbetween\s+{NUM}\s+(?:and|to|-)\s+{NUM}")
+CGPA_RANGE_RES = [
+    (re.compile(rf"\b(?:at least|minimum of|>=)\s*{NUM}"), ">="),
+    (re.compile(rf"\b(?:at most|maximum of|<=)\s*{NUM}"), "<="),
+    (re.compile(rf"(?:\b(?:above|greater than|more than|over)\s+|>\s*){NUM}"), ">"),
+    (re.compile(rf"(?:\b(?:below|less than|under)\s+|<\s*){NUM}"), "<"),
+]
+
+NOT_PLACED_RE = re.compile(r"\b(not\s+placed|unplaced)\b")
+PLACED_RE = re.compile(r"\bplaced\b|\bplacements?\b")
+# The company name runs to the end of the clause: "placed in ncr atleos
+# from cse" -> "ncr atleos"
+COMPANY_RE = re.compile(
+    r"\bplaced\s+(?:in|at|with)\s+([a-z0-9\[][a-z0-9&.\[\]\- ]*?)"
+    r"(?=\s+(?:and|or|from|in|of|who|whose|with|having|above|below|over|under|between"
+    r"|during|for|batch|branch|students?)\b|\s*[,?!;]|\.(?:\s|$)|$)"
+)
+
+JOINING_YEAR_RE = re.compile(rf"\b(?:joined|joining(?: year)?|admitted|batch)\s+(?:in\s+|of\s+)?{YEAR}")
+PASSED_YEAR_RE = re.compile(rf"\b(?:passed(?: out)?|passing(?: year)?|graduated|graduating)\s+(?:in\s+|of\s+)?{YEAR}")
+
+RATE_RE = re.compile(r"\bplacement\s+(rate|percentage|ratio)\b|\b(percentage|percent|%)\s+(of\s+)?(students\s+)?placed\b")
+# "roll number of ..." asks for a roll number, not a count
+COUNT_RE = re.compile(r"\b(how many|count|(?<!roll )number of)\b")
+TOP_RE = re.compile(r"\b(top|best|highest|bottom|lowest)\s+(\d+)\b")
+AGG_RES = [
+    (re.compile(r"\b(average|avg|mean)\b"), "avg"),
+    (re.compile(r"\b(highest|maximum|max|top)\b"), "max"),
+    (re.compile(r"\b(lowest|minimum|min)\b"), "min"),
+]
+
+GROUP_RES = [
+    (re.compile(r"\b(per|by|each|every)\s+branch\b|\bbranch[- ]?wise\b"), "branch"),
+    (re.compile(r"\b(per|by|each|every)\s+company\b|\bcompany[- ]?wise\b"), "company"),
+    (re.compile(r"\b(per|by|each|every)\s+(joining|admission)\s+year\b"), "joining_year"),
+    (re.compile(r"\b(per|by|each|every)\s+(passing\s+|passed\s+)?year\b|\byear[- ]?wise\b"), "passed_year"),
+]
+
+
+def normalize(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def parse_query(query: str, columns=DEFAULT_COLUMNS) -> StudentQuery:
+    # Case is lost in normalization, so the capitalized IT is noted first
+    it_branch = IT_BRANCH_RE.search(query) is not None
+    return _parse_normalized(normalize(query), tuple(columns), it_branch)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _parse_normalized(q: str, columns, it_branch=False) -> StudentQuery:
+    filters = []
+
+    # -------- Branch --------
+    unknown_branch = None
+    m = BRANCH_RE.search(q)
+    if m:
+        filters.append(Compare("branch", "=", BRANCHES[m.group(1)]))
+    elif it_branch or IT_BRANCH_WORDS_RE.search(q):
+        filters.append(Compare("branch", "=", BRANCHES["it"]))
+    else:
+        m = UNKNOWN_BRANCH_RE.search(q)
+        if m:
+            unknown_branch = UNKNOWN_BRANCHES[m.group(1)]
+
+    # -------- Gender (whole words: "male" is not inside "female") --------
+    if FEMALE_RE.search(q):
+        filters.append(Compare("gender_norm", "=", "female"))
+    elif MALE_RE.search(q):
+        filters.append(Compare("gender_norm", "=", "male"))
+
+    # -------- CGPA --------
+    m = CGPA_BETWEEN_RE.search(q)
+    if m:
+        low, high = sorted((float(m.group(1)), float(m.group(2))))
+        filters.append(Between("cgpa", low, high))
+    else:
+        for pattern, op in CGPA_RANGE_RES:
+            m = pattern.search(q)
+            # Years are not CGPA bounds ("joined after 2020")
+            if m and float(m.group(1)) <= 10:
+                filters.append(Compare("cgpa", op, float(m.group(1))))
+                break
+
+    # -------- Placement / company --------
+    company = COMPANY_RE.search(q)
+    if company and (company.group(1) in BRANCHES or company.group(1) in UNKNOWN_BRANCHES):
+        company = None                       # "placed in cse" is a branch
+    rate = RATE_RE.search(q) is not None
+    if rate:
+        pass                                 # the rate is over placed and unplaced
+    elif NOT_PLACED_RE.search(q):
+        filters.append(IsNull("company_norm"))
+    elif company:
+        filters.append(HasCompany(company.group(1)))
+    elif PLACED_RE.search(q):
+        filters.append(IsNull("company_norm", negated=True))
+
+    # -------- Years --------
+    m = JOINING_YEAR_RE.search(q)
+    if m:
+        filters.append(Compare("joining_year", "=", int(m.group(1))))
+    m = PASSED_YEAR_RE.search(q)
+    if m:
+        filters.append(Compare("passed_year", "=", int(m.group(1))))
+
+    # -------- Grouping --------
+    group_by = tuple(col for pattern, col in GROUP_RES if pattern.search(q))
+
+    # -------- Top N (a ranked listing, not an aggregate) --------
+    ranking = None
+    m = TOP_RE.search(q)
+    if m and not rate and not group_by and int(m.group(2)) > 0:
+        descending = m.group(1) not in ("bottom", "lowest")
+        ranking = Ranking("cgpa", min(int(m.group(2)), TOP_N_MAX), descending)
+
+    # -------- Aggregate --------
+    aggregate = Aggregate("placement_rate") if rate else None
+    for pattern, func in AGG_RES if aggregate is None and ranking is None else ():
+        if pattern.search(q) and "cgpa" in q:
+            aggregate = Aggregate(func, "cgpa")
+            break
+    if aggregate is None and ranking is None and (COUNT_RE.search(q) or group_by):
+        aggregate = Aggregate("count")
+
+    return StudentQuery(tuple(filters), aggregate, group_by, columns, ranking, unknown_branch)
+
+
+# ---------------- COMPILER ----------------
+def _check_column(column):
+    # Column names are interpolated into SQL, so only known ones pass
+    if column not in COLUMNS:
+        raise ValueError(f"Unknown column: {column}")
+    return column
+
+
+# Group keys that are not students columns
+GROUP_EXPRS = {"company": "sc.company"}
+
+
+def _group_expr(column) -> str:
+    return GROUP_EXPRS.get(column) or _check_column(column)
+
+
+def _compile_filter(shape) -> str:
+    if shape[0] == "company":
+        return "students.roll_no IN (SELECT roll_no FROM student_companies WHERE company_key = ?)"
+    kind, column = shape[0], _check_column(shape[1])
+    if kind == "cmp":
+        op = shape[2]
+        if op not in ("=", ">", ">=", "<", "<="):
+            raise ValueError(f"Unknown operator: {op}")
+        return f"{column} {op} ?"
+    if kind == "between":
+        return f"{column} BETWEEN ? AND ?"
+    return f"{column} IS NOT NULL" if shape[2] else f"{column} IS NULL"
+
+
+def _aggregate_expr(aggregate: Aggregate) -> str:
+    if aggregate.func == "count":
+        return "COUNT(*)"
+    if aggregate.func == "placement_rate":
+        return "ROUND(100.0 * AVG(company_norm IS NOT NULL), 1)"
+    if aggregate.func in ("avg", "min", "max"):
+        return f"ROUND({aggregate.func.upper()}({_check_column(aggregate.column)}), 2)"
+    raise ValueError(f"Unknown aggregate: {aggregate.func}")
+
+
+# The same aggregates re-aggregated from students_rollup's measures
+ROLLUP_AGGREGATES = {
+    "count": "SUM(n)",
+    "placement_rate": "ROUND(100.0 * SUM(placed_n) / SUM(n), 1)",
+    "avg": "ROUND(SUM(cgpa_sum) / SUM(cgpa_n), 2)",
+    "min": "ROUND(MIN(cgpa_min), 2)",
+    "max": "ROUND(MAX(cgpa_max), 2)",
+}
+
+
+def rollup_eligible(shape) -> bool:
+    """True when the rollup alone can answer the query."""
+    filter_shapes, aggregate, group_by, _, _ = shape
+    if aggregate is None:
+        return False
+    if aggregate.column not in (None, "cgpa"):
+        return False
+    for f in filter_shapes:
+        if f[0] in ("between", "company") or f[1] not in ROLLUP_DIMENSIONS:
+            return False
+        if f[0] == "cmp" and f[2] != "=":
+            return False
+    return all(c in ROLLUP_DIMENSIONS for c in group_by)
+
+
+@lru_cache(maxsize=PLAN_CACHE_SIZE)
+def compile_shape(shape, use_rollup=False, paged=False) -> str:
+    """
+    SQL text for a query shape. `paged` listings take two extra trailing
+    parameters, the last roll_no already returned and the page size
+    (keyset pagination: each page is an index range scan, no OFFSET).
+    Ranked listings are never paged; their LIMIT is the last parameter.
+    """
+    filter_shapes, aggregate, group_by, columns, ranking = shape
+    paged = paged and aggregate is None and ranking is None
+    per_company = "company" in group_by
+    group_by = [_group_expr(c) for c in group_by]
+    rollup = use_rollup and rollup_eligible(shape)
+
+    if rollup:
+        select = ", ".join(group_by + [ROLLUP_AGGREGATES[aggregate.func]])
+    elif aggregate is not None:
+        select = ", ".join(group_by + [_aggregate_expr(aggregate)])
+    else:
+        select = ", ".join(_check_column(c) for c in columns)
+
+    if rollup:
+        source = "students_rollup"
+    elif per_company:
+        # One row per offer: a student placed in two companies counts in both
+        source = "students JOIN student_companies sc ON sc.roll_no = students.roll_no"
+    else:
+        source = "students"
+    sql = f"SELECT {select} FROM {source}"
+
+    where = [_compile_filter(s) for s in filter_shapes]
+    if paged:
+        where.append("roll_no > ?")
+    ranked = aggregate is None and ranking is not None
+    if ranked:
+        where.append(f"{_check_column(ranking[0])} IS NOT NULL")
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+
+    if group_by:
+        sql += " GROUP BY " + ", ".join(group_by)
+        sql += " ORDER BY " + ", ".join(group_by)
+    elif ranked:
+        column, descending = ranking
+        sql += f" ORDER BY {column} {'DESC' if descending else 'ASC'}, roll_no LIMIT ?"
+    elif aggregate is None:
+        sql += " ORDER BY roll_no"
+    if paged:
+        sql += " LIMIT ?"
+
+    return sql
+
+
+def compile_query(plan: StudentQuery, use_rollup=False):
+    """Returns (sql, params)."""
+    return compile_shape(plan.shape(), use_rollup), plan.params()
+
+
+def compile_page(plan: StudentQuery, after="", limit=SQL_PAGE_SIZE):
+    """(sql, params) for one page of a listing, starting after roll_no `after`."""
+    return compile_shape(plan.shape(), False, True), plan.params() + [after or "", limit]
+
+
+def plan_cache_stats() -> dict:
+    parse, compiled = _parse_normalized.cache_info(), compile_shape.cache_info()
+    return {
+        "parse": {"hits": parse.hits, "misses": parse.misses, "size": parse.currsize},
+        "compile": {"hits": compiled.hits, "misses": compiled.misses, "size": compiled.currsize},
+    }
+
+
+# ---------------- EXECUTION ----------------
+def rollups_available(conn) -> bool:
+    return USE_ROLLUPS and conn.execute("PRAGMA user_version").fetchone()[0] >= ROLLUP_SCHEMA_VERSION
+
+
+def run_query(conn, plan: StudentQuery):
+    use_rollup = plan.aggregate is not None and rollups_available(conn)
+    sql, params = compile_query(plan, use_rollup)
+    return conn.execute(sql, params).fetchall()
+
+
+def fetch_page(conn, plan: StudentQuery, after="", limit=SQL_PAGE_SIZE):
+    """
+    One page of a listing plan. Returns (rows, next_after), where
+    next_after is the roll_no to continue from, or None on the last page.
+    """
+    # A top-N listing is one short page
+    if plan.ranking is not None:
+        sql, params = compile_query(plan)
+        return conn.execute(sql, params).fetchall(), None
+
+    if "roll_no" not in plan.columns:
+        raise ValueError("paged listings must select roll_no")
+
+    # One extra row tells whether another page exists
+    sql, params = compile_page(plan, after, limit + 1)
+    rows = conn.execute(sql, params).fetchall()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, rows[-1][plan.columns.index("roll_no")]
+
+
+def unknown_branch_message(plan: StudentQuery) -> str:
+    return (f"There is no {plan.unknown_branch} branch in the college. "
+            f"Branches: {', '.join(BRANCH_VALUES)}.")
+
+
+def format_aggregate(plan: StudentQuery, rows) -> str:
+    """Answer text for a COUNT / AVG / MIN / MAX plan's rows."""
+    agg = plan.aggregate
+    if agg.func == "count":
+        label = "Students"
+    elif agg.func == "placement_rate":
+        label = "Placement rate (%)"
+    else:
+        label = f"{agg.func.upper()} {agg.column.upper()}"
+    criteria = describe(plan)
+    header = f"{label} ({criteria})" if criteria else label
+
+    if not plan.group_by:
+        return f"{header}: {rows[0][0] if rows and rows[0][0] is not None else 0}"
+
+    if not rows:
+        return f"{header}: no matching students."
+
+    lines = [
+        " / ".join(str(v) for v in row[:-1]) + f": {row[-1]}"
+        for row in rows
+    ]
+    return f"{header} by {', '.join(plan.group_by)}:\n" + "\n".join(lines)
+
+
+def describe(plan: StudentQuery) -> str:
+    """Short human description of the filters, for answer text."""
+    parts = []
+    for f in plan.filters:
+        if isinstance(f, Compare):
+            label = {"gender_norm": "gender", "company_norm": "company"}.get(f.column, f.column)
+            parts.append(f"{label} {f.op} {f.value}" if f.op != "=" else f"{label}: {f.value}")
+        elif isinstance(f, Between):
+            parts.append(f"{f.column} between {f.low} and {f.high}")
+        elif isinstance(f, HasCompany):
+            parts.append(f"company: {f.company}")
+        else:
+            parts.append("not placed" if not f.negated else "placed")
+    return ", ".join(parts)
@@ -1,138 +1,111 @@
-import sqlite3
-import re
-import os
-
-# ---------------- PATH ----------------
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.dirname(os.path.dirname(BASE_DIR))
-DB_PATH = os.path.join(PROJECT_ROOT, "students.db")
-
-
-# ---------------- HELPERS ----------------
-def extract_cgpa(query: str):
-    q = query.lower()
-    patterns = [
-        (r"(above|greater than|more than)\s+(\d+(\.\d+)?)", ">"),
-        (r"(below|less than)\s+(\d+(\.\d+)?)", "<")
+from database.sql.connection_pool import student_pool
+from database.sql.query_planner import (
+    SQL_PAGE_SIZE,
+    fetch_page,
+    format_aggregate,
+    parse_query,
+    run_query,
+    unknown_branch_message,
+)
+
+
+def format_rows(rows):
+    return [
+        f"{name} ({roll}) - {branch}, CGPA: {cgpa}, Company: {company}"
+        for name, roll, branch, cgpa, company in rows
     ]
-    for pattern, op in patterns:
-        m = re.search(pattern, q)
-        if m:
-            return op, float(m.group(2))
-    return None
 
 
-def extract_company(query: str):
+# ---------------- MAIN HANDLER ----------------
+def handle_user_query(query, after=None, limit=SQL_PAGE_SIZE):
     """
-    Extract company name after keywords like:
-    placed in, placed at, placed with
+    Listings are returned a page at a time. When more rows exist the
+    result carries "next_after", the roll_no to pass back as `after`
+    for the following page.
     """
-    q = query.lower()
-    match = re.search(r"placed\s+(in|at|with)\s+([a-zA-Z]+)", q)
-    if match:
-        return match.group(2).strip().title()
-    return None
-
-
-def is_count_query(query: str) -> bool:
-    q = query.lower()
-    return any(k in q for k in ["how many", "count", "number of"])
-
-
-# ---------------- MAIN HANDLER ----------------
-def handle_user_query(query):
-    filters = {}
-    q = query.lower()
-
-    # -------- Branch --------
-    if "cse" in q:
-        filters["branch"] = "CSE"
-    elif "ece" in q:
-        filters["branch"] = "ECE"
-    elif "csd" in q:
-        filters["branch"] = "CSD"
-
-    # -------- Gender --------
-    if "female" in q:
-        filters["gender"] = "female"
-    elif "male" in q:
-        filters["gender"] = "male"
-
-    # -------- CGPA --------
-    cgpa_filter = extract_cgpa(q)
-    if cgpa_filter:
-        filters["cgpa"] = cgpa_filter
-
-    # -------- Placement --------
-    company = extract_company(q)
-    if "placed" in q:
-        filters["placed"] = True
-    if company:
-        filters["company"] = company
+    plan = parse_query(query)
 
     # -------- Validate --------
-    if not filters:
+    if plan.unknown_branch:
+        return {"status": "success", "answer": unknown_branch_message(plan)}
+
+    if plan.empty:
         return {
             "status": "need_more_info",
             "message": "Please specify placement, branch, CGPA, or company."
         }
 
-    # -------- COUNT QUERY --------
-    if is_count_query(q):
-        sql = "SELECT COUNT(*) FROM students WHERE 1=1"
-        params = []
-    else:
-        sql = "SELECT name, roll_no, branch, cgpa, company_placed FROM students WHERE 1=1"
-        params = []
-
-    # -------- Apply Filters --------
-    if "branch" in filters:
-        sql += " AND branch=?"
-        params.append(filters["branch"])
-
-    if "gender" in filters:
-        sql += " AND LOWER(gender)=?"
-        params.append(filters["gender"])
-
-    if "cgpa" in filters:
-        op, val = filters["cgpa"]
-        sql += f" AND cgpa {op} ?"
-        params.append(val)
-
-    if "placed" in filters:
-        sql += " AND company_placed IS NOT NULL"
-
-    if "company" in filters:
-        sql += " AND LOWER(company_placed)=?"
-        params.append(filters["company"].lower())
-
-    # -------- Execute --------
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    cur.execute(sql, params)
-    rows = cur.fetchall()
-    conn.close()
-
-    # -------- Format Response --------
-    if is_count_query(q):
-        count = rows[0][0]
+    # -------- Aggregates --------
+    if plan.aggregate is not None:
+        with student_pool.connection() as conn:
+            rows = run_query(conn, plan)
         return {
             "status": "success",
-            "answer": f"Total students placed in {filters.get('company','companies')}: {count}"
+            "answer": format_aggregate(plan, rows)
         }
 
+    # -------- Execute (one page) --------
+    with student_pool.connection() as conn:
+        rows, next_after = fetch_page(conn, plan, after, limit)
+
+    # -------- Format Response --------
     if not rows:
         return {
             "status": "success",
-            "answer": "No students found matching the criteria."
+            "answer": "No students found matching the criteria." if after is None
+            else "No more students."
         }
 
-    result = [
-        f"{name} ({roll}) - {branch}, CGPA: {cgpa}, Company: {company}"
-        for name, roll, branch, cgpa, company in rows
-    ]
-
+    if plan.ranking is not None:
+        r = plan.ranking
+        header = f"{'Top' if r.descending else 'Bottom'} {len(rows)} students by {r.column.upper()}:"
+    else:
+        header = "Students found:" if after is None else "More students:"
     return {
         "status": "success",
-        "answer": "Placed students:\n" + "\n".join(result)
+        "answer": header + "\n" + "\n".join(format_rows(rows)),
+        "next_after": next_after
     }
+
+
+# ---------------- ROW STREAM ----------------
+def stream_rows(query, batch_size=200):
+    """
+    Every matching row as events, read a keyset page of `batch_size` at a
+    time so memory stays flat however many rows match:
+
+        {"type": "columns", "columns": [...]}
+        {"type": "row", "row": [...]}            (repeated)
+        {"type": "done", "count": n}
+
+    A pooled connection is held only while a page is fetched, never
+    while the client reads, so a slow download cannot starve other
+    lookups.
+    """
+    plan = parse_query(query)
+
+    if plan.unknown_branch:
+        yield {"type": "error", "message": unknown_branch_message(plan)}
+        return
+
+    if plan.empty or plan.aggregate is not None:
+        yield {"type": "error", "message": "Row streaming needs a student listing query."}
+        return
+
+    count = 0
+    after = ""
+    yield {"type": "columns", "columns": list(plan.columns)}
+    while True:
+        try:
+            with student_pool.connection() as conn:
+                rows, after = fetch_page(conn, plan, after, batch_size)
+        except TimeoutError:
+            yield {"type": "error", "message": "The student database is busy. Please try again."}
+            return
+
+        for row in rows:
+            count += 1
+            yield {"type": "row", "row": list(row)}
+        if after is None:
+            break
+    yield {"type": "done", "count": count}
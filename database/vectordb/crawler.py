@@ -0,0 +1,291 @@
+"""
+Concurrent crawler for the college website.
+
+- one aiohttp session with a pooled connector and a per-host limit
+- conditional GETs (ETag / Last-Modified) against a local page cache,
+  so pages that did not change are reported "not_modified" and served
+  from the cache instead of being downloaded again
+- optional sitemap.xml and same-domain link discovery
+
+Allowed hosts default to the hosts of the seed URLs and the cache
+directory is a parameter, so the crawler can be pointed at a local HTTP
+server serving fixture pages.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import re
+import threading
+import time
+from urllib.parse import urldefrag, urljoin, urlparse
+
+import aiohttp
+from bs4 import BeautifulSoup
+
+# -----------------------------
+# PATH SETUP
+# -----------------------------
+CURRENT_FILE = os.path.abspath(__file__)                 # project_bot/database/vectordb/crawler.py
+VECTORDIR = os.path.dirname(CURRENT_FILE)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(VECTORDIR))
+
+PAGE_CACHE_DIR = os.path.join(PROJECT_ROOT, "data", "page_cache")
+
+# -----------------------------
+# CONFIG
+# -----------------------------
+MAX_CONCURRENCY = 16
+PER_HOST_LIMIT = 4
+REQUEST_TIMEOUT = 20
+MAX_PAGES = 200
+
+USER_AGENT = "college-chatbot-crawler/1.0"
+
+# Links to these are never crawled
+SKIP_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".svg", ".zip", ".rar",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".mp4", ".mp3",
+)
+
+
+# -----------------------------
+# PAGE CACHE
+# -----------------------------
+class PageCache:
+    """
+    HTML of previously fetched pages plus their validators, stored as
+    <sha1(url)>.html files and one index.json.
+    """
+
+    def __init__(self, cache_dir=PAGE_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.index_path = os.path.join(cache_dir, "index.json")
+        os.makedirs(cache_dir, exist_ok=True)
+
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                self.index = json.load(f)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def _html_path(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode("utf-8")).hexdigest() + ".html")
+
+    def validators(self, url) -> dict:
+        entry = self.index.get(url)
+        if not entry or not os.path.exists(self._html_path(url)):
+            return {}
+
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def load(self, url):
+        with open(self._html_path(url), encoding="utf-8") as f:
+            return f.read()
+
+    def store(self, url, html, etag=None, last_modified=None):
+        with open(self._html_path(url), "w", encoding="utf-8") as f:
+            f.write(html)
+        self.index[url] = {
+            "etag": etag,
+            "last_modified": last_modified,
+            "fetched_at": time.time(),
+        }
+
+    def save(self):
+        tmp = self.index_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+
+# -----------------------------
+# URL HELPERS
+# -----------------------------
+def normalize_url(url: str) -> str:
+    return urldefrag(url.strip())[0]
+
+
+def is_crawlable(url: str, allowed_hosts) -> bool:
+    parsed = urlparse(url)
+    return (
+        parsed.scheme in ("http", "https")
+        and parsed.netloc in allowed_hosts
+        and not parsed.path.lower().endswith(SKIP_EXTENSIONS)
+    )
+
+
+def extract_links(base_url: str, html: str):
+    soup = BeautifulSoup(html, "html.parser")
+    for a in soup.find_all("a", href=True):
+        yield normalize_url(urljoin(base_url, a["href"]))
+
+
+def parse_sitemap(xml: str):
+    """Returns (page_urls, nested_sitemap_urls)."""
+    locs = [normalize_url(loc) for loc in re.findall(r"<loc>\s*([^<\s]+)\s*</loc>", xml)]
+    if "<sitemapindex" in xml:
+        return [], locs
+    return locs, []
+
+
+# -----------------------------
+# CRAWLER
+# -----------------------------
+class Crawler:
+    """
+    Results are dicts:
+
+        {"url": ..., "status": "fetched",      "html": ...}
+        {"url": ..., "status": "not_modified", "html": <cached html>}
+        {"url": ..., "status": "failed",       "html": None, "error": ...}
+    """
+
+    def __init__(self, seeds, allowed_hosts=None, cache_dir=PAGE_CACHE_DIR,
+                 max_concurrency=MAX_CONCURRENCY, per_host=PER_HOST_LIMIT,
+                 timeout=REQUEST_TIMEOUT, discover_links=False, max_depth=1,
+                 use_sitemap=False, max_pages=MAX_PAGES):
+        self.seeds = [normalize_url(u) for u in seeds]
+        self.allowed_hosts = set(allowed_hosts or {urlparse(u).netloc for u in self.seeds})
+        self.cache = PageCache(cache_dir)
+        self.max_concurrency = max_concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.discover_links = discover_links
+        self.max_depth = max_depth
+        self.use_sitemap = use_sitemap
+        self.max_pages = max_pages
+
+        self.counts = {"fetched": 0, "not_modified": 0, "failed": 0}
+
+    # -------- sitemap --------
+    async def _sitemap_urls(self, session):
+        found = []
+        scheme = urlparse(self.seeds[0]).scheme if self.seeds else "https"
+        pending = [f"{scheme}://{host}/sitemap.xml" for host in self.allowed_hosts]
+        visited = set()
+
+        while pending and len(found) < self.max_pages:
+            sm = pending.pop()
+            if sm in visited:
+                continue
+            visited.add(sm)
+            try:
+                async with session.get(sm) as res:
+                    if res.status != 200:
+                        continue
+                    pages, nested = parse_sitemap(await res.text())
+            except Exception as e:
+                print(f"⚠ Sitemap {sm} unavailable: {e}")
+                continue
+            found += [u for u in pages if is_crawlable(u, self.allowed_hosts)]
+            pending += nested
+
+        return found
+
+    # -------- single page --------
+    async def _fetch(self, session, url):
+        headers = self.cache.validators(url)
+        try:
+            async with session.get(url, headers=headers) as res:
+                if res.status == 304:
+                    self.counts["not_modified"] += 1
+                    return {"url": url, "status": "not_modified", "html": self.cache.load(url)}
+
+                res.raise_for_status()
+                html = await res.text()
+                self.cache.store(
+                    url, html,
+                    etag=res.headers.get("ETag"),
+                    last_modified=res.headers.get("Last-Modified")
+                )
+                self.counts["fetched"] += 1
+                return {"url": url, "status": "fetched", "html": html}
+
+        except Exception as e:
+            print(f"❌ Failed to scrape {url}: {e}")
+            self.counts["failed"] += 1
+            return {"url": url, "status": "failed", "html": None, "error": str(e)}
+
+    # -------- crawl --------
+    async def crawl(self, on_result):
+        """Crawl everything, calling on_result(result) as pages finish."""
+        connector = aiohttp.TCPConnector(limit=self.max_concurrency, limit_per_host=self.per_host)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                         headers={"User-Agent": USER_AGENT}) as session:
+            work = asyncio.Queue()
+            seen = set()
+
+            def enqueue(url, depth):
+                if url not in seen and len(seen) < self.max_pages and is_crawlable(url, self.allowed_hosts):
+                    seen.add(url)
+                    work.put_nowait((url, depth))
+
+            for url in self.seeds:
+                enqueue(url, 0)
+            if self.use_sitemap:
+                for url in await self._sitemap_urls(session):
+                    enqueue(url, 1)
+
+            async def worker():
+                while True:
+                    url, depth = await work.get()
+                    try:
+                        print(f"🌐 Scraping → {url}")
+                        result = await self._fetch(session, url)
+                        if self.discover_links and depth < self.max_depth and result["html"]:
+                            for link in extract_links(url, result["html"]):
+                                enqueue(link, depth + 1)
+                        on_result(result)
+                    finally:
+                        work.task_done()
+
+            workers = [asyncio.create_task(worker()) for _ in range(self.max_concurrency)]
+            await work.join()
+            for w in workers:
+                w.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+        self.cache.save()
+
+
+def iter_crawl(seeds, **kwargs):
+    """
+    Synchronous iterator over crawl results, produced as pages finish.
+    The event loop runs in a background thread.
+    """
+    crawler = Crawler(seeds, **kwargs)
+    results = queue.Queue()
+    done = object()
+    errors = []
+
+    def run():
+        try:
+            asyncio.run(crawler.crawl(results.put))
+        except Exception as e:
+            errors.append(e)
+        finally:
+            results.put(done)
+
+    thread = threading.Thread(target=run, name="crawler", daemon=True)
+    thread.start()
+
+    while True:
+        item = results.get()
+        if item is done:
+            break
+        yield item
+
+    thread.join()
+    if errors:
+        raise errors[0]
+
+    print(f"🕸 Crawl finished: {crawler.counts}")
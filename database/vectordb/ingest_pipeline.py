@@ -0,0 +1,285 @@
+"""
+Staged web ingestion: fetch -> clean -> chunk -> embed.
+
+Each stage runs in its own thread(s) and hands work to the next through
+a bounded queue, so a slow page never stalls cleaning or embedding of the
+pages already downloaded. Embedding runs in large, length-sorted batches.
+"""
+import queue
+import threading
+import time
+
+_DONE = object()
+
+
+class _StageError:
+    """Carries an exception that stopped a stage through to run_pipeline."""
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _drain(inq):
+    """Discard input up to the end marker so upstream stages can finish."""
+    while inq.get() is not _DONE:
+        pass
+    inq.put(_DONE)
+
+
+# -----------------------------
+# STAGE STATS
+# -----------------------------
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, items, seconds):
+        with self._lock:
+            self.items += items
+            self.busy_seconds += seconds
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "items": self.items,
+            "busy_s": round(self.busy_seconds, 2),
+            "items_per_s": round(self.items / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+        }
+
+
+# -----------------------------
+# GENERIC STAGE
+# -----------------------------
+def _run_stage(fn, inq, outq, stats, on_error, workers=1):
+    """
+    Start `workers` threads applying fn(item, emit) to everything on `inq`.
+    When the last worker exits, normally or not, it forwards the end
+    marker to `outq`. A failing item is logged and skipped; anything
+    else that stops a worker goes to on_error(exc).
+    """
+    remaining = [workers]
+    lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                item = inq.get()
+                if item is _DONE:
+                    inq.put(_DONE)          # let sibling workers see it too
+                    return
+
+                start = time.perf_counter()
+                try:
+                    fn(item, outq.put)
+                except Exception as e:
+                    print(f"❌ {stats.name} failed on item: {e}")
+                stats.record(1, time.perf_counter() - start)
+        except BaseException as e:
+            on_error(e)
+            _drain(inq)
+        finally:
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                outq.put(_DONE)
+
+    threads = [threading.Thread(target=worker, name=f"ingest-{stats.name}-{i}", daemon=True)
+               for i in range(workers)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def _run_embed_stage(embed_fn, inq, outq, stats, on_error, batch_size, max_wait):
+    """
+    Gather up to `batch_size` chunks (or whatever arrived within
+    `max_wait` seconds), sort them by length to reduce padding and embed
+    them with one call. A failed batch stops the stage: the error goes to
+    on_error(exc), the rest of the input is discarded and the end marker
+    is still forwarded.
+    """
+    def flush(batch):
+        batch.sort(key=lambda rec: len(rec["text"]))
+        start = time.perf_counter()
+        vectors = embed_fn([rec["text"] for rec in batch])
+        stats.record(len(batch), time.perf_counter() - start)
+        for rec, vec in zip(batch, vectors):
+            rec["embedding"] = vec.tolist() if hasattr(vec, "tolist") else list(vec)
+            outq.put(rec)
+
+    def worker():
+        batch = []
+        try:
+            while True:
+                try:
+                    item = inq.get(timeout=max_wait if batch else None)
+                except queue.Empty:
+                    flush(batch)
+                    batch = []
+                    continue
+
+                if item is _DONE:
+                    if batch:
+                        flush(batch)
+                    return
+
+                batch.append(item)
+                if len(batch) >= batch_size:
+                    flush(batch)
+                    batch = []
+        except BaseException as e:
+            on_error(e)
+            _drain(inq)
+        finally:
+            outq.put(_DONE)
+
+    thread = threading.Thread(target=worker, name="ingest-embed", daemon=True)
+    thread.start()
+    return [thread]
+
+
+# -----------------------------
+# PIPELINE
+# -----------------------------
+def run_pipeline(urls, fetch_fn, clean_fn, chunk_fn, embed_fn, make_id,
+                 known_ids=frozenset(), fetch_workers=4, queue_size=64,
+                 embed_batch_size=64, embed_max_wait=0.5, source=None):
+    """
+    Run the staged pipeline over `urls`.
+
+    fetch_fn(url)   -> html, or None when the request failed
+    source          -> optional iterable of (url, html, status) replacing
+                       the fetch stage (e.g. the async crawler); status
+                       "unchanged" skips the page entirely
+    clean_fn(html)  -> text
+    chunk_fn(text)  -> list of chunk strings
+    embed_fn(texts) -> list of vectors
+    make_id(url, chunk) -> deterministic chunk ID
+
+    Chunks whose ID is in `known_ids` skip the embed stage. Yields one
+    event dict per result:
+
+        {"kind": "failed", "url": ...}                    fetch failed
+        {"kind": "unchanged", "url": ...}                 source reported no change
+        {"kind": "page", "url": ..., "text": ...}         page cleaned
+        {"kind": "chunk", "id", "url", "text", "index", "embedding"}
+                                                          embedding is None for known IDs
+
+    and returns per-stage throughput via the final
+    {"kind": "report", "stages": [...], "wall_s": ...} event.
+
+    If `source` or a stage fails outright (not just one page), every
+    stage still shuts down and the first such error is re-raised here
+    once the threads have finished.
+    """
+    url_q = queue.Queue()
+    html_q = queue.Queue(maxsize=queue_size)
+    text_q = queue.Queue(maxsize=queue_size)
+    embed_q = queue.Queue(maxsize=queue_size * 4)
+    out_q = queue.Queue()
+
+    stats = {name: StageStats(name) for name in ["fetch", "clean", "chunk", "embed"]}
+    started = time.perf_counter()
+
+    def on_error(exc):
+        out_q.put(_StageError(exc))
+
+    # -------- fetch --------
+    def fetch(url, emit):
+        html = fetch_fn(url)
+        emit((url, html, "failed" if html is None else "fetched"))
+
+    def feed(emit):
+        try:
+            start = time.perf_counter()
+            for url, html, status in source:
+                stats["fetch"].record(1, time.perf_counter() - start)
+                emit((url, html, status))
+                start = time.perf_counter()
+        except BaseException as e:
+            on_error(e)
+        finally:
+            emit(_DONE)
+
+    # -------- clean --------
+    def clean(item, emit):
+        url, html, status = item
+        if status == "unchanged":
+            out_q.put({"kind": "unchanged", "url": url})
+            return
+        if html is None:
+            out_q.put({"kind": "failed", "url": url})
+            return
+        emit((url, clean_fn(html)))
+
+    # -------- chunk --------
+    # Known chunks bypass the embed stage; the embed stage forwards its
+    # end marker to out_q, so everything reaches out_q before it.
+    def chunk(item, emit):
+        url, text = item
+        out_q.put({"kind": "page", "url": url, "text": text})
+        if not text:
+            return
+        for idx, piece in enumerate(chunk_fn(text)):
+            rec = {
+                "kind": "chunk",
+                "id": make_id(url, piece),
+                "url": url,
+                "text": piece,
+                "index": idx,
+                "embedding": None,
+            }
+            if rec["id"] in known_ids:
+                out_q.put(rec)
+            else:
+                emit(rec)
+
+    threads = []
+    if source is None:
+        threads += _run_stage(fetch, url_q, html_q, stats["fetch"], on_error, workers=fetch_workers)
+    else:
+        feeder = threading.Thread(target=feed, args=(html_q.put,), name="ingest-source", daemon=True)
+        feeder.start()
+        threads.append(feeder)
+    threads += _run_stage(clean, html_q, text_q, stats["clean"], on_error)
+    threads += _run_stage(chunk, text_q, embed_q, stats["chunk"], on_error)
+    threads += _run_embed_stage(embed_fn, embed_q, out_q, stats["embed"], on_error,
+                                embed_batch_size, embed_max_wait)
+
+    if source is None:
+        for url in urls:
+            url_q.put(url)
+        url_q.put(_DONE)
+
+    error = None
+    while True:
+        item = out_q.get()
+        if item is _DONE:
+            break
+        if isinstance(item, _StageError):
+            error = error or item.error
+            continue
+        if error is None:
+            yield item
+
+    for t in threads:
+        t.join()
+
+    if error is not None:
+        raise error
+
+    yield {
+        "kind": "report",
+        "stages": [s.as_dict() for s in stats.values()],
+        "wall_s": round(time.perf_counter() - started, 2),
+    }
+
+
+def print_report(report):
+    print(f"\n📊 Ingestion throughput (wall {report['wall_s']}s)")
+    for s in report["stages"]:
+        print(f"   {s['stage']:<6} {s['items']:>6} items  {s['busy_s']:>8}s busy  {s['items_per_s']:>8}/s")
@@ -1,13 +1,16 @@
 import os
-import shutil
+import sys
 import json
 import re
+import time
+import uuid
+import hashlib
+import argparse
 import requests
 import chromadb
 import trafilatura
 import nltk
 from nltk.tokenize import sent_tokenize
-from sentence_transformers import SentenceTransformer
 
 # -----------------------------
 # NLTK SETUP (SAFE)
@@ -23,39 +26,35 @@ except LookupError:
     nltk.download("punkt_tab")
 
 # -----------------------------
-# PATH SETUP (PORTABLE)
+# PATH SETUP (PROJECT ROOT SAFE)
 # -----------------------------
-import os
-
-CURRENT_FILE = os.path.abspath(__file__)
-VECTORDIR = os.path.dirname(CURRENT_FILE)        # project_bot/database/vectordb
-DATABASE_DIR = os.path.dirname(VECTORDIR)        # project_bot/database
-PROJECT_ROOT = os.path.dirname(DATABASE_DIR)     # project_bot
-
-FAQ_PATH = os.path.join(
-    PROJECT_ROOT,
-    "data",
-    "embeddings",
-    "faq_embeddings.json"
-)
-
-VECTOR_DB_PATH = os.path.join(
-    PROJECT_ROOT,
-    "vector_db"
-)
-
-
-# -----------------------------
-# STRONG IDEMPOTENCY
-# -----------------------------
-print("🔄 Checking vector DB state...")
-
-if os.path.exists(VECTOR_DB_PATH):
-    print("⚠ Existing vector_db found. Deleting for fresh rebuild...")
-    shutil.rmtree(VECTOR_DB_PATH)
-
-os.makedirs(VECTOR_DB_PATH, exist_ok=True)
-print("✅ Fresh vector_db directory ready")
+CURRENT_FILE = os.path.abspath(__file__)                 # project_bot/database/vectordb/vectordb.py
+VECTORDIR = os.path.dirname(CURRENT_FILE)                # project_bot/database/vectordb
+DATABASE_DIR = os.path.dirname(VECTORDIR)                # project_bot/database
+PROJECT_ROOT = os.path.dirname(DATABASE_DIR)             # project_bot
+
+DATA_DIR = os.path.join(PROJECT_ROOT, "data")
+CHUNKS_DIR = os.path.join(DATA_DIR, "chunks")
+EMBEDDINGS_DIR = os.path.join(DATA_DIR, "embeddings")
+
+FAQ_PATH = os.path.join(EMBEDDINGS_DIR, "faq_embeddings.json")
+# Binary stores (<prefix>.npy + <prefix>.meta.json), see services/embedding_store.py
+FAQ_STORE = os.path.join(EMBEDDINGS_DIR, "faq_embeddings")
+WEB_STORE = os.path.join(EMBEDDINGS_DIR, "web_embeddings")
+VECTOR_DB_PATH = os.path.join(PROJECT_ROOT, "vector_db")
+MANIFEST_PATH = os.path.join(VECTOR_DB_PATH, "manifest.json")
+
+os.makedirs(CHUNKS_DIR, exist_ok=True)
+os.makedirs(EMBEDDINGS_DIR, exist_ok=True)
+
+# Allow `python database/vectordb/vectordb.py` to import project modules
+if PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, PROJECT_ROOT)
+
+from database.vectordb.crawler import iter_crawl
+from services import embedding_store
+from services.lexical_index import TOKENIZER_VERSION, BM25Index
+from database.vectordb.ingest_pipeline import print_report, run_pipeline
 
 # -----------------------------
 # TARGET WEB PAGES
@@ -78,16 +77,26 @@ TARGET_PAGES = [
 CHUNK_SIZE = 400
 CHUNK_OVERLAP = 80
 
-# -----------------------------
-# LOAD FAQ DATA
-# -----------------------------
-with open(FAQ_PATH, encoding="utf-8") as f:
-    faqs = json.load(f)
+# Ingestion pipeline sizing
+FETCH_WORKERS = 4
+EMBED_BATCH_SIZE = 64
+
+# Served collection names; each build writes versioned copies
+# (e.g. webdocs_collection_v4) and the manifest maps these names to them.
+COLLECTION_NAMES = ["faqs_collection", "webdocs_collection"]
 
 # -----------------------------
-# EMBEDDING MODEL
+# EMBEDDING MODEL (LOADED ON FIRST USE)
 # -----------------------------
-embedder = SentenceTransformer("BAAI/bge-large-en-v1.5")
+_embedder = None
+
+
+def get_embedder():
+    global _embedder
+    if _embedder is None:
+        from sentence_transformers import SentenceTransformer
+        _embedder = SentenceTransformer("BAAI/bge-large-en-v1.5")
+    return _embedder
 
 # -----------------------------
 # TEXT CLEANING
@@ -119,49 +128,118 @@ def chunk_text(text: str):
 # -----------------------------
 # SCRAPING
 # -----------------------------
-def scrape_page(url: str) -> str:
+def fetch_page(url: str):
+    """Raw HTML, or None if the request failed."""
     print(f"🌐 Scraping → {url}")
     try:
         res = requests.get(url, timeout=20)
         res.raise_for_status()
-        text = clean_text(res.text)
-        return text
+        return res.text
     except Exception as e:
         print(f"❌ Failed to scrape {url}: {e}")
-        return ""
+        return None
+
+
+def scrape_page(url: str):
+    """Cleaned page text, or None if the request failed."""
+    html = fetch_page(url)
+    return None if html is None else clean_text(html)
+
+# -----------------------------
+# DETERMINISTIC IDS
+# -----------------------------
+# hash() is salted per interpreter run, so IDs are derived from SHA-1.
+def content_hash(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def make_chunk_id(url: str, chunk: str) -> str:
+    # Same URL + same text => same ID, so unchanged chunks keep their vectors
+    return f"{content_hash(url)[:16]}_{content_hash(chunk)[:16]}"
 
 # -----------------------------
-# CHROMA CLIENT (FRESH)
+# MANIFEST (ALIASES)
 # -----------------------------
-client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+def read_manifest() -> dict:
+    try:
+        with open(MANIFEST_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(manifest: dict):
+    # os.replace is atomic, so readers see either the old or the new build
+    tmp = MANIFEST_PATH + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, MANIFEST_PATH)
+
+
+def resolve_collection(manifest: dict, name: str) -> str:
+    return manifest.get("collections", {}).get(name, name)
+
+
+def load_existing(client, name):
+    """{id: (document, metadata, embedding)} of a served collection, or {}."""
+    try:
+        col = client.get_collection(name)
+    except Exception:
+        return {}
+
+    data = col.get(include=["documents", "metadatas", "embeddings"])
+    return {
+        i: (d, m, list(e))
+        for i, d, m, e in zip(data["ids"], data["documents"], data["metadatas"], data["embeddings"])
+    }
 
-# Safety: delete collections if they somehow exist
-for col in ["faqs_collection", "webdocs_collection"]:
+
+def new_collection(client, name):
     try:
-        client.delete_collection(col)
+        client.delete_collection(name)
     except Exception:
         pass
+    return client.get_or_create_collection(name=name, metadata={"hnsw:space": "cosine"})
 
-faqs_collection = client.get_or_create_collection(
-    name="faqs_collection",
-    metadata={"hnsw:space": "cosine"}
-)
 
-web_collection = client.get_or_create_collection(
-    name="webdocs_collection",
-    metadata={"hnsw:space": "cosine"}
-)
+def add_in_batches(collection, ids, documents, embeddings, metadatas, batch_size=1000):
+    for start in range(0, len(ids), batch_size):
+        end = start + batch_size
+        collection.add(
+            ids=ids[start:end],
+            documents=documents[start:end],
+            embeddings=embeddings[start:end],
+            metadatas=metadatas[start:end]
+        )
 
 # -----------------------------
-# STORE FAQ VECTORS
+# FAQ VECTORS
 # -----------------------------
-print("\n🚀 Storing FAQ vectors...")
+def faq_source_files():
+    # Prefer the binary store; fall back to the legacy JSON file
+    if embedding_store.exists(FAQ_STORE):
+        return list(embedding_store.store_paths(FAQ_STORE))
+    return [FAQ_PATH]
+
+
+def load_faqs():
+    """FAQ rows with their embedding, from the binary store or legacy JSON."""
+    if not embedding_store.exists(FAQ_STORE):
+        with open(FAQ_PATH, encoding="utf-8") as f:
+            return json.load(f)
+
+    _, matrix, records = embedding_store.load_embeddings(FAQ_STORE)
+    return [
+        dict(record, embedding=row.astype("float32").tolist())
+        for record, row in zip(records, matrix)
+    ]
+
 
-faqs_collection.add(
-    ids=[f"faq_{f['faq_id']:05d}" for f in faqs],
-    documents=[f["combined_text"] for f in faqs],
-    embeddings=[f["embedding"] for f in faqs],
-    metadatas=[
+def build_faq_records(faqs):
+    ids = [f"faq_{f['faq_id']:05d}" for f in faqs]
+    documents = [f["combined_text"] for f in faqs]
+    embeddings = [f["embedding"] for f in faqs]
+    metadatas = [
         {
             "type": "faq",
             "faq_id": f["faq_id"],
@@ -170,47 +248,301 @@ faqs_collection.add(
         }
         for f in faqs
     ]
-)
-
-print(f"✅ FAQ stored: {faqs_collection.count()}")
+    return ids, documents, embeddings, metadatas
 
 # -----------------------------
-# BUILD WEB VECTOR DB
+# WEB VECTORS (INCREMENTAL)
 # -----------------------------
-print("\n🚀 Building web document vectors...")
-
-ids, documents, embeddings, metadatas = [], [], [], []
-counter = 0
-
-for url in TARGET_PAGES:
-    text = scrape_page(url)
+def clean_page(html: str) -> str:
+    # Pages with too little content are dropped before chunking
+    text = clean_text(html)
+    return text if len(text) >= 200 else ""
+
+
+def embed_texts(texts):
+    return get_embedder().encode(
+        texts,
+        batch_size=EMBED_BATCH_SIZE,
+        normalize_embeddings=True
+    )
+
+
+def crawl_source(indexed_urls, discover_links=False, use_sitemap=False):
+    """
+    (url, html, status) items from the async crawler. Pages the server
+    reports as not modified, and that are already indexed, are passed on
+    as "unchanged" so the pipeline skips them.
+    """
+    for result in iter_crawl(TARGET_PAGES, discover_links=discover_links, use_sitemap=use_sitemap):
+        url = result["url"]
+        if result["status"] == "not_modified" and url in indexed_urls:
+            yield url, None, "unchanged"
+        elif result["html"] is None:
+            yield url, None, "failed"
+        else:
+            yield url, result["html"], "fetched"
+
+
+def build_web_records(existing, previous_pages, crawl=True, discover_links=False, use_sitemap=False,
+                      reembed=False):
+    """
+    Run TARGET_PAGES through the ingestion pipeline and return
+    (records, pages, stats).
+
+    Chunks whose ID already exists in `existing` reuse the stored vector;
+    only new or changed chunks are embedded. Pages that cannot be fetched,
+    or that the server reports unchanged, keep their previous chunks.
+    With reembed=True every fetched chunk is embedded again and `existing`
+    is only used for pages that cannot be fetched.
+    With crawl=False pages are fetched one by one with requests.
+    """
+    records = {}            # id -> (document, metadata, embedding)
+    pages = {}
+    stats = {"reused": 0, "embedded": 0, "carried_over": 0, "unchanged_pages": 0}
+
+    by_url = {}
+    for cid, (doc, meta, emb) in existing.items():
+        by_url.setdefault(meta.get("source_url"), []).append((cid, doc, meta, emb))
+
+    # Re-embedding: 304 responses come back with the cached HTML as "fetched"
+    known = {} if reembed else existing
+    indexed_urls = set() if reembed else set(by_url)
+    source = crawl_source(indexed_urls, discover_links, use_sitemap) if crawl else None
+
+    short_pages = set()
+    chunks_by_url = {}
+
+    for event in run_pipeline(
+        TARGET_PAGES,
+        fetch_fn=fetch_page,
+        clean_fn=clean_page,
+        chunk_fn=chunk_text,
+        embed_fn=embed_texts,
+        make_id=make_chunk_id,
+        known_ids=frozenset(known),
+        fetch_workers=FETCH_WORKERS,
+        embed_batch_size=EMBED_BATCH_SIZE,
+        source=source,
+    ):
+        kind = event["kind"]
+
+        if kind in ("failed", "unchanged"):
+            url = event["url"]
+            for cid, doc, meta, emb in by_url.get(url, []):
+                records[cid] = (doc, meta, emb)
+                stats["carried_over" if kind == "failed" else "reused"] += 1
+            if kind == "unchanged":
+                stats["unchanged_pages"] += 1
+            if url in previous_pages:
+                pages[url] = previous_pages[url]
+
+        elif kind == "page":
+            if not event["text"]:
+                print(f"⚠ Skipped (insufficient content): {event['url']}")
+                short_pages.add(event["url"])
+            else:
+                pages[event["url"]] = content_hash(event["text"])
+
+        elif kind == "chunk":
+            chunks_by_url.setdefault(event["url"], []).append(event)
+
+        elif kind == "report":
+            print_report(event)
+
+    # -------- Collect chunks (pages may finish in any order) --------
+    # Seed pages first, then anything found by link / sitemap discovery
+    ordered = TARGET_PAGES + sorted(set(chunks_by_url) - set(TARGET_PAGES))
+    for url in ordered:
+        if url in short_pages:
+            continue
+        for event in sorted(chunks_by_url.get(url, []), key=lambda e: e["index"]):
+            cid = event["id"]
+            if cid in records:
+                continue
+            meta = {"source_url": url, "chunk_index": event["index"]}
+            if event["embedding"] is None:
+                records[cid] = (event["text"], meta, existing[cid][2])
+                stats["reused"] += 1
+            else:
+                records[cid] = (event["text"], meta, event["embedding"])
+                stats["embedded"] += 1
+
+    stats["stale"] = len(set(existing) - set(records))
+    return records, pages, stats
 
-    if not text or len(text) < 200:
-        print("⚠ Skipped (insufficient content)")
-        continue
-
-    chunks = chunk_text(text)
-
-    for idx, chunk in enumerate(chunks):
-        ids.append(f"{abs(hash(url))}_{idx}")
-        documents.append(chunk)
-        embeddings.append(embedder.encode(chunk, normalize_embeddings=True).tolist())
-        metadatas.append({"source_url": url})
-        counter += 1
+# -----------------------------
+# SAVE CHUNKS & EMBEDDINGS
+# -----------------------------
+def export_files(records):
+    all_chunks = [
+        {"id": cid, "source_url": meta["source_url"], "text": doc}
+        for cid, (doc, meta, _) in records.items()
+    ]
+    with open(os.path.join(CHUNKS_DIR, "web_chunks.json"), "w", encoding="utf-8") as f:
+        json.dump(all_chunks, f, indent=2, ensure_ascii=False)
 
-print(f"\nPrepared {counter} chunks. Saving to vector DB...")
+    # Embeddings go to a float32 matrix instead of pretty-printed JSON
+    embedding_store.save_embeddings(
+        WEB_STORE,
+        list(records),
+        [emb for (_, _, emb) in records.values()]
+    )
 
-web_collection.add(
-    ids=ids,
-    documents=documents,
-    embeddings=embeddings,
-    metadatas=metadatas
-)
+    print("📁 Chunks saved to:", CHUNKS_DIR)
+    print("📁 Embeddings saved to:", EMBEDDINGS_DIR)
 
 # -----------------------------
-# FINAL REPORT
+# BUILD
 # -----------------------------
-print("\n🎯 FINAL RESULT")
-print("FAQ Count:", faqs_collection.count())
-print("Web Count:", web_collection.count())
-print("🔥 Vector database rebuilt successfully (IDEMPOTENT)")
+def build(full=False, export=True, crawl=True, discover_links=False, use_sitemap=False):
+    # A full rebuild re-embeds everything into new versioned collections
+    # and swaps the manifest like any other build; the served collections
+    # stay in place until then.
+    if full:
+        print("⚠ Full rebuild requested. Re-embedding all FAQ and web documents...")
+    os.makedirs(VECTOR_DB_PATH, exist_ok=True)
+
+    manifest = read_manifest()
+    version = manifest.get("version", 0) + 1
+    client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+
+    served = {name: resolve_collection(manifest, name) for name in COLLECTION_NAMES}
+    collections = dict(served)
+
+    # -------- FAQ --------
+    faq_digest = hashlib.sha1()
+    for path in faq_source_files():
+        with open(path, "rb") as f:
+            faq_digest.update(f.read())
+    faq_hash = faq_digest.hexdigest()
+
+    if faq_hash == manifest.get("faq_hash") and not full:
+        print("✅ FAQ data unchanged, keeping", served["faqs_collection"])
+    else:
+        print("\n🚀 Storing FAQ vectors...")
+        faqs = load_faqs()
+
+        name = f"faqs_collection_v{version}"
+        faqs_collection = new_collection(client, name)
+        add_in_batches(faqs_collection, *build_faq_records(faqs))
+        collections["faqs_collection"] = name
+        print(f"✅ FAQ stored: {faqs_collection.count()}")
+
+    # -------- WEB --------
+    print("\n🚀 Building web document vectors...")
+    existing = load_existing(client, served["webdocs_collection"])
+    records, pages, stats = build_web_records(
+        existing, manifest.get("pages", {}),
+        crawl=crawl, discover_links=discover_links, use_sitemap=use_sitemap,
+        reembed=full
+    )
+    print(f"♻ reused={stats['reused']} 🆕 embedded={stats['embedded']} "
+          f"↪ carried_over={stats['carried_over']} 🗑 stale={stats['stale']} "
+          f"⏸ unchanged_pages={stats['unchanged_pages']}")
+
+    if set(records) == set(existing) and not full:
+        print("✅ Web chunks unchanged, keeping", served["webdocs_collection"])
+    else:
+        name = f"webdocs_collection_v{version}"
+        web_collection = new_collection(client, name)
+        ids = list(records)
+        add_in_batches(
+            web_collection,
+            ids,
+            [records[i][0] for i in ids],
+            [records[i][2] for i in ids],
+            [records[i][1] for i in ids]
+        )
+        collections["webdocs_collection"] = name
+
+    if export:
+        export_files(records)
+
+    # Nothing re-indexed: keep serving the current build as it is, so
+    # caches keyed on build_id stay valid. Only page validators move on.
+    lexical_name = manifest.get("lexical_index")
+    modified = (
+        collections != served
+        or manifest.get("lexical_tokenizer") != TOKENIZER_VERSION
+        or not lexical_name
+        or not os.path.exists(os.path.join(VECTOR_DB_PATH, lexical_name))
+    )
+
+    if not modified:
+        print("✅ No collection changed, keeping build", manifest.get("build_id"))
+        write_manifest({**manifest, "pages": pages})
+        return
+
+    # -------- Lexical (BM25) index --------
+    faq_ids, faq_docs, _, faq_metas = build_faq_records(load_faqs())
+    web_ids = list(records)
+    lexical_name = f"lexical_index_v{version}.json"
+    BM25Index.build(
+        faq_ids + web_ids,
+        faq_docs + [records[i][0] for i in web_ids],
+        faq_metas + [records[i][1] for i in web_ids]
+    ).save(os.path.join(VECTOR_DB_PATH, lexical_name))
+    print(f"🔤 BM25 index saved: {lexical_name}")
+
+    # -------- Atomic swap --------
+    # services/rag.py watches the manifest: a new build_id drops cached
+    # answers and reopens the collections under their new names.
+    write_manifest({
+        "build_id": uuid.uuid4().hex,
+        "built_at": time.time(),
+        "version": version,
+        "collections": collections,
+        "lexical_index": lexical_name,
+        "lexical_tokenizer": TOKENIZER_VERSION,
+        "faq_hash": faq_hash,
+        "pages": pages,
+    })
+
+    # -------- Cleanup --------
+    # Keep the current and the previously served versions so in-flight
+    # readers of the old alias can finish; drop anything older.
+    keep = set(collections.values()) | set(served.values())
+    for col in client.list_collections():
+        col_name = col if isinstance(col, str) else col.name
+        if col_name not in keep and any(col_name.startswith(n) for n in COLLECTION_NAMES):
+            client.delete_collection(col_name)
+
+    keep_files = {lexical_name, manifest.get("lexical_index")}
+    for fname in os.listdir(VECTOR_DB_PATH):
+        if fname.startswith("lexical_index_v") and fname not in keep_files:
+            os.remove(os.path.join(VECTOR_DB_PATH, fname))
+
+    # -----------------------------
+    # FINAL REPORT
+    # -----------------------------
+    print("\n🎯 FINAL RESULT")
+    print("FAQ Count:", client.get_collection(collections["faqs_collection"]).count())
+    print("Web Count:", client.get_collection(collections["webdocs_collection"]).count())
+    print(f"🔥 Vector database updated to version {version}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build or refresh the vector DB")
+    parser.add_argument("--full", action="store_true",
+                        help="re-embed everything into new collections instead of reusing vectors")
+    parser.add_argument("--no-export", action="store_true",
+                        help="do not write data/chunks and data/embeddings files")
+    parser.add_argument("--sequential", action="store_true",
+                        help="fetch pages one by one with requests instead of the async crawler")
+    parser.add_argument("--discover", action="store_true",
+                        help="also crawl same-domain pages linked from TARGET_PAGES")
+    parser.add_argument("--sitemap", action="store_true",
+                        help="also crawl pages listed in the site's sitemap.xml")
+    args = parser.parse_args(argv)
+
+    build(
+        full=args.full,
+        export=not args.no_export,
+        crawl=not args.sequential,
+        discover_links=args.discover,
+        use_sitemap=args.sitemap
+    )
+
+
+if __name__ == "__main__":
+    main()
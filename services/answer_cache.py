@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# ---------------- CONFIG ----------------
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "512"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIM_THRESHOLD = float(os.getenv("ANSWER_CACHE_SIM_THRESHOLD", "0.95"))
+
+
+# ---------------- ANSWER CACHE ----------------
+class AnswerCache:
+    """
+    Caches final RAG answers.
+
+    Lookup is two-step: an exact match on the normalized query text,
+    then a cosine-similarity match against the embeddings of cached
+    queries. Entries expire after `ttl_seconds` and the least recently
+    used entry is evicted once `max_size` is reached. The whole cache is
+    dropped when the vector DB build id changes.
+    """
+
+    def __init__(self, max_size=ANSWER_CACHE_SIZE, ttl_seconds=ANSWER_CACHE_TTL,
+                 similarity_threshold=ANSWER_CACHE_SIM_THRESHOLD):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries = OrderedDict()    # normalized query -> entry
+        self._lock = threading.Lock()
+        self._build_id = None
+
+        # Stacked query vectors, rebuilt lazily after inserts / evictions
+        self._matrix = None
+        self._matrix_keys = []
+
+        self._counters = {
+            "exact_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+        }
+
+    # ---------------- INVALIDATION ----------------
+    def sync_build(self, build_id):
+        """Clear the cache if the vector DB was rebuilt since the last call."""
+        with self._lock:
+            if build_id == self._build_id:
+                return
+            if self._entries:
+                self._counters["invalidations"] += 1
+            self._build_id = build_id
+            self._clear_locked()
+
+    def clear(self):
+        with self._lock:
+            self._clear_locked()
+
+    def _clear_locked(self):
+        self._entries.clear()
+        self._matrix = None
+        self._matrix_keys = []
+
+    # ---------------- LOOKUP ----------------
+    def get_exact(self, key):
+        with self._lock:
+            entry = self._live_entry(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            self._counters["exact_hits"] += 1
+            return entry
+
+    def get_similar(self, vector):
+        with self._lock:
+            if not self._entries:
+                self._counters["misses"] += 1
+                return None
+
+            if self._matrix is None:
+                self._matrix_keys = list(self._entries.keys())
+                self._matrix = np.stack([self._entries[k]["vector"] for k in self._matrix_keys])
+
+            # Vectors are unit length, so the dot product is the cosine
+            sims = self._matrix @ np.asarray(vector, dtype=self._matrix.dtype)
+            best = int(np.argmax(sims))
+
+            if sims[best] >= self.similarity_threshold:
+                key = self._matrix_keys[best]
+                entry = self._live_entry(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    self._counters["semantic_hits"] += 1
+                    return dict(entry, similarity=float(sims[best]))
+
+            self._counters["misses"] += 1
+            return None
+
+    def _live_entry(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.time() - entry["created"] > self.ttl_seconds:
+            del self._entries[key]
+            self._matrix = None
+            self._counters["expirations"] += 1
+            return None
+        return entry
+
+    # ---------------- INSERT ----------------
+    def put(self, key, vector, answer, evidence):
+        with self._lock:
+            self._entries[key] = {
+                "answer": answer,
+                "evidence": evidence,
+                "vector": np.asarray(vector),
+                "created": time.time(),
+            }
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+            self._matrix = None
+
+    # ---------------- STATS ----------------
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self._counters["exact_hits"] + self._counters["semantic_hits"]
+            lookups = hits + self._counters["misses"]
+            return {
+                "enabled": ANSWER_CACHE_ENABLED,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                **self._counters,
+            }
+
+
+answer_cache = AnswerCache()
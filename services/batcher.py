@@ -0,0 +1,185 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+# ---------------- CONFIG ----------------
+# Set RAG_BATCHING=1 to route embed / rerank / generate calls through
+# the micro-batching scheduler below.
+BATCHING_ENABLED = os.getenv("RAG_BATCHING", "0") == "1"
+MAX_BATCH_SIZE = int(os.getenv("RAG_BATCH_MAX_SIZE", "16"))
+MAX_WAIT_MS = float(os.getenv("RAG_BATCH_MAX_WAIT_MS", "10"))
+
+
+# ---------------- MICRO BATCHER ----------------
+class MicroBatcher:
+    """
+    Collects requests submitted from many threads and runs them through
+    `batch_fn` together.
+
+    A batch is flushed when it reaches `max_batch_size` items or when the
+    oldest item has waited `max_wait_ms`, whichever comes first.
+    `batch_fn` receives a list of items and must return a list of results
+    in the same order.
+    """
+
+    def __init__(self, name, batch_fn, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.name = name
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue = queue.Queue()
+        self._thread = None
+        self._start_lock = threading.Lock()
+
+        self.batches_run = 0
+        self.items_run = 0
+        self.last_batch_size = 0
+
+    # ---------------- PUBLIC ----------------
+    def submit(self, item):
+        """Queue one item and block until its result is ready."""
+        self._ensure_started()
+        future = Future()
+        self._queue.put((item, future))
+        return future.result()
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self._queue.qsize(),
+            "batches_run": self.batches_run,
+            "items_run": self.items_run,
+            "avg_batch_size": round(self.items_run / self.batches_run, 2) if self.batches_run else 0.0,
+            "last_batch_size": self.last_batch_size,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+        }
+
+    # ---------------- WORKER ----------------
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name=f"batcher-{self.name}",
+                    daemon=True
+                )
+                self._thread.start()
+
+    def _collect(self):
+        # Block for the first item, then gather more until full or timed out
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            futures = [future for _, future in batch]
+
+            try:
+                results = self.batch_fn(items)
+            except Exception as e:
+                for future in futures:
+                    future.set_exception(e)
+                continue
+
+            self.batches_run += 1
+            self.items_run += len(batch)
+            self.last_batch_size = len(batch)
+
+            for future, result in zip(futures, results):
+                future.set_result(result)
+
+
+# ---------------- STAGE FUNCTIONS ----------------
+def _embed_batch(queries):
+    from services.model_registry import get_embedder
+
+    vectors = get_embedder().encode(queries, normalize_embeddings=True)
+    return [v for v in vectors]
+
+
+def _rerank_batch(pair_lists):
+    # Flatten every request's pairs into one predict() call, then split back
+    from services.model_registry import get_reranker
+
+    flat = [pair for pairs in pair_lists for pair in pairs]
+    if not flat:
+        return [[] for _ in pair_lists]
+
+    scores = list(get_reranker().predict(flat))
+
+    results = []
+    offset = 0
+    for pairs in pair_lists:
+        results.append(scores[offset:offset + len(pairs)])
+        offset += len(pairs)
+    return results
+
+
+def _generate_batch(items):
+    # items: list of (prompt, generate_kwargs); requests with different
+    # kwargs are generated in separate sub-batches.
+    from services.model_registry import get_generator
+
+    tokenizer, generator = get_generator()
+
+    groups = {}
+    for idx, (prompt, kwargs) in enumerate(items):
+        groups.setdefault(tuple(sorted(kwargs.items())), []).append(idx)
+
+    answers = [None] * len(items)
+    for key, idxs in groups.items():
+        prompts = [items[i][0] for i in idxs]
+        inputs = tokenizer(
+            prompts, return_tensors="pt", padding=True, truncation=True, max_length=512
+        ).to(generator.device)
+        output = generator.generate(**inputs, **dict(key))
+        decoded = tokenizer.batch_decode(output, skip_special_tokens=True)
+        for i, text in zip(idxs, decoded):
+            answers[i] = text
+
+    return answers
+
+
+# ---------------- STAGES ----------------
+STAGES = {
+    "embed": MicroBatcher("embed", _embed_batch),
+    "rerank": MicroBatcher("rerank", _rerank_batch),
+    "generate": MicroBatcher("generate", _generate_batch),
+}
+
+
+def embed(query):
+    return STAGES["embed"].submit(query)
+
+
+def rerank_scores(pairs):
+    return STAGES["rerank"].submit(pairs)
+
+
+def generate(prompt, **kwargs):
+    return STAGES["generate"].submit((prompt, kwargs))
+
+
+def stats() -> dict:
+    return {
+        "enabled": BATCHING_ENABLED,
+        "stages": {name: stage.stats() for name, stage in STAGES.items()},
+    }
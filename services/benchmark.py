@@ -0,0 +1,316 @@
+"""
+Offline benchmarks for the RAG stack.
+
+Run from the project root, e.g.
+
+    python -m services.benchmark retrieval --limit 100
+    python -m services.benchmark retrievers
+    python -m services.benchmark backends onnx
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+from services.model_registry import PROJECT_ROOT
+
+FAQ_ROWS_PATH = os.path.join(PROJECT_ROOT, "data", "rawdata", "faq_rows.json")
+
+
+# ---------------- HELPERS ----------------
+def load_faq_rows(limit=None):
+    with open(FAQ_ROWS_PATH, "r", encoding="utf-8") as f:
+        rows = json.load(f)
+    return rows[:limit] if limit else rows
+
+
+def latency_summary(samples_ms) -> dict:
+    arr = np.array(samples_ms)
+    return {
+        "mean_ms": round(float(arr.mean()), 2),
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+    }
+
+
+def _timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def print_table(rows, columns):
+    widths = [max(len(c), *(len(str(r[c])) for r in rows)) for c in columns]
+    print("  ".join(c.ljust(w) for c, w in zip(columns, widths)))
+    for r in rows:
+        print("  ".join(str(r[c]).ljust(w) for c, w in zip(columns, widths)))
+
+
+# ---------------- RETRIEVAL: LATENCY / RECALL ----------------
+# (name, adaptive, cascade, hybrid)
+RETRIEVAL_CONFIGS = [
+    ("baseline", False, False, False),
+    ("adaptive", True, False, False),
+    ("cascade", False, True, False),
+    ("adaptive+cascade", True, True, False),
+    ("hybrid", False, False, True),
+    ("hybrid+cascade", False, True, True),
+]
+
+
+def bench_retrieval(limit=None, top_k=5):
+    """
+    For every FAQ question, measure retrieve + rerank latency and whether
+    the FAQ's own record comes back at rank 1 / within top_k.
+    """
+    from services import rag
+
+    rows = load_faq_rows(limit)
+
+    # Embed everything up front so every config sees a warm cache
+    for row in rows:
+        rag.embed_query(row["question"])
+
+    report = []
+    for name, adaptive, cascade, hybrid in RETRIEVAL_CONFIGS:
+        latencies, hit1, hitk = [], 0, 0
+
+        for row in rows:
+            query = row["question"]
+            query_emb = rag.embed_query(query)
+
+            start = time.perf_counter()
+            reranked = rag.retrieve_and_rerank(
+                query, query_emb, top_k=top_k, adaptive=adaptive, cascade=cascade, hybrid=hybrid
+            )
+            latencies.append((time.perf_counter() - start) * 1000)
+
+            docs = [r["document"] for r in reranked]
+            target = row["combined_text"].strip()
+            if docs and docs[0] == target:
+                hit1 += 1
+            if target in docs:
+                hitk += 1
+
+        report.append({
+            "config": name,
+            **latency_summary(latencies),
+            "recall@1": round(hit1 / len(rows), 3),
+            f"recall@{top_k}": round(hitk / len(rows), 3),
+        })
+
+    print(f"\nRetrieval benchmark over {len(rows)} FAQ questions\n")
+    print_table(report, list(report[0].keys()))
+    return report
+
+
+# ---------------- RETRIEVERS: CHROMA VS EXACT ----------------
+def bench_retrievers(limit=None, top_k=30, batch_size=32):
+    """
+    Per-query latency of Chroma vs the in-process ExactIndex on the FAQ
+    questions, batched ExactIndex throughput, and top-k overlap between
+    the two.
+    """
+    from services import rag
+    from services.model_registry import get_collection, get_exact_index
+
+    rows = load_faq_rows(limit)
+    vectors = np.stack([rag.embed_query(r["question"]) for r in rows])
+    report, overlap = [], []
+
+    for name in rag.RETRIEVAL_COLLECTIONS:
+        chroma, exact = get_collection(name), get_exact_index(name)
+        timings = {"chroma": [], "exact": []}
+
+        for vec in vectors:
+            c, c_ms = _timed(chroma.query, query_embeddings=[vec.tolist()], n_results=top_k,
+                             include=["distances"])
+            e, e_ms = _timed(exact.query, query_embeddings=[vec], n_results=top_k)
+            timings["chroma"].append(c_ms)
+            timings["exact"].append(e_ms)
+            k = min(len(c["ids"][0]), len(e["ids"][0])) or 1
+            overlap.append(len(set(c["ids"][0]) & set(e["ids"][0])) / k)
+
+        batch_ms = []
+        for start in range(0, len(vectors), batch_size):
+            _, ms = _timed(exact.search, vectors[start:start + batch_size], top_k)
+            batch_ms.append(ms / len(vectors[start:start + batch_size]))
+
+        for backend, samples in [*timings.items(), (f"exact x{batch_size}", batch_ms)]:
+            report.append({
+                "collection": name,
+                "size": exact.count(),
+                "retriever": backend,
+                **latency_summary(samples),
+            })
+
+    print(f"\nRetriever benchmark over {len(rows)} FAQ questions, top_k={top_k}")
+    print("(batched rows are per query)\n")
+    print_table(report, list(report[0].keys()))
+    print(f"\nMean top-{top_k} overlap chroma vs exact: {np.mean(overlap):.3f}")
+    return report
+
+
+# ---------------- BACKENDS: ACCURACY VS FP32 ----------------
+def peak_rss_mb() -> float:
+    import resource
+    # ru_maxrss is KiB on Linux
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def run_backend(backend, limit=50, gen_limit=10) -> dict:
+    """
+    Embeddings, reranker scores and generated answers of one backend on
+    the FAQ rows, with latencies, generated-token count and peak RSS.
+    Meant to run alone in a process (see measure_backend).
+    """
+    from services import inference_backends as ib
+    from services.rag import GENERATION_KWARGS, build_prompt
+
+    rows = load_faq_rows(limit)
+    questions = [r["question"] for r in rows]
+    docs = [r["combined_text"] for r in rows]
+    result = {"backend": backend}
+
+    # -------- Embedder --------
+    model = ib.load_embedder(backend)
+    vecs, result["embed_ms"] = _timed(model.encode, questions, normalize_embeddings=True)
+    result["embeddings"] = np.asarray(vecs, dtype=np.float32).tolist()
+    del model
+
+    # -------- Reranker --------
+    model = ib.load_reranker(backend)
+    scores, result["rerank_ms"] = [], 0.0
+    for q in questions:
+        s, ms = _timed(model.predict, [[q, d] for d in docs])
+        scores.append(np.asarray(s, dtype=np.float32).tolist())
+        result["rerank_ms"] += ms
+    result["rerank_scores"] = scores
+    del model
+
+    # -------- Generator --------
+    tok, model = ib.load_generator(backend)
+    answers, result["gen_ms"], result["gen_tokens"] = [], 0.0, 0
+    for row in rows[:gen_limit]:
+        inputs = tok(build_prompt(row["question"], row["combined_text"]), return_tensors="pt")
+        out, ms = _timed(model.generate, **inputs, **GENERATION_KWARGS)
+        result["gen_ms"] += ms
+        result["gen_tokens"] += len(out[0])
+        answers.append(tok.decode(out[0], skip_special_tokens=True))
+    result["answers"] = answers
+
+    result["peak_rss_mb"] = peak_rss_mb()
+    return result
+
+
+def measure_backend(backend, limit=50, gen_limit=10) -> dict:
+    """run_backend in a fresh interpreter, so latency and RSS are its own."""
+    import subprocess
+    import sys
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as tmp:
+        out = os.path.join(tmp, f"{backend}.json")
+        subprocess.run(
+            [sys.executable, "-m", "services.benchmark", "backend-run", backend,
+             "--limit", str(limit), "--gen-limit", str(gen_limit), "--out", out],
+            cwd=PROJECT_ROOT, check=True
+        )
+        with open(out, encoding="utf-8") as f:
+            return json.load(f)
+
+
+def bench_backends(backend, limit=50, gen_limit=10):
+    """
+    Compare `backend` against the fp32 PyTorch baseline on FAQ questions:
+    embedding cosine, reranker score drift and top-1 agreement, and exact
+    match of generated answers. Each backend is measured in its own
+    process; generator latency is per token that backend generated.
+    """
+    base = measure_backend("torch", limit, gen_limit)
+    cand = measure_backend(backend, limit, gen_limit)
+    n_rows = len(base["embeddings"])
+    n_docs = len(base["rerank_scores"][0]) if base["rerank_scores"] else 0
+    report = []
+
+    # -------- Embedder --------
+    cos = np.sum(np.asarray(base["embeddings"]) * np.asarray(cand["embeddings"]), axis=1)
+    report.append({
+        "model": "embedder",
+        "metric": f"cosine mean={cos.mean():.4f} min={cos.min():.4f}",
+        "fp32_ms/item": round(base["embed_ms"] / n_rows, 2),
+        f"{backend}_ms/item": round(cand["embed_ms"] / n_rows, 2),
+    })
+
+    # -------- Reranker --------
+    agree, drift = 0, []
+    for b, c in zip(base["rerank_scores"], cand["rerank_scores"]):
+        agree += int(np.argmax(b) == np.argmax(c))
+        drift.append(float(np.max(np.abs(np.asarray(b) - np.asarray(c)))))
+    report.append({
+        "model": "reranker",
+        "metric": f"top1 agree={agree / n_rows:.3f} max|Δscore|={max(drift):.4f}",
+        "fp32_ms/item": round(base["rerank_ms"] / (n_rows * n_docs), 3),
+        f"{backend}_ms/item": round(cand["rerank_ms"] / (n_rows * n_docs), 3),
+    })
+
+    # -------- Generator --------
+    same = sum(int(b == c) for b, c in zip(base["answers"], cand["answers"]))
+    report.append({
+        "model": "generator",
+        "metric": f"exact match={same / max(len(base['answers']), 1):.3f}",
+        "fp32_ms/item": round(base["gen_ms"] / max(base["gen_tokens"], 1), 2),
+        f"{backend}_ms/item": round(cand["gen_ms"] / max(cand["gen_tokens"], 1), 2),
+    })
+
+    print(f"\nBackend check: {backend} vs torch fp32 ({n_rows} FAQ rows)")
+    print("(generator latency is per generated token)\n")
+    print_table(report, list(report[0].keys()))
+    print(f"\nPeak RSS: torch fp32 {base['peak_rss_mb']} MB, {backend} {cand['peak_rss_mb']} MB")
+    return report
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="RAG benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("retrieval", help="latency / recall of adaptive, cascaded and hybrid retrieval")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--top-k", type=int, default=5)
+
+    p = sub.add_parser("retrievers", help="latency of Chroma vs the exact in-process index")
+    p.add_argument("--limit", type=int, default=None)
+    p.add_argument("--top-k", type=int, default=30)
+    p.add_argument("--batch-size", type=int, default=32)
+
+    p = sub.add_parser("backends", help="accuracy / latency of an inference backend against fp32")
+    p.add_argument("backend", choices=["torch-int8", "onnx"])
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--gen-limit", type=int, default=10)
+
+    # Used by `backends` to measure each backend in its own process
+    p = sub.add_parser("backend-run", help=argparse.SUPPRESS)
+    p.add_argument("backend", choices=["torch", "torch-int8", "onnx"])
+    p.add_argument("--limit", type=int, default=50)
+    p.add_argument("--gen-limit", type=int, default=10)
+    p.add_argument("--out", required=True)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "retrieval":
+        bench_retrieval(limit=args.limit, top_k=args.top_k)
+    elif args.command == "retrievers":
+        bench_retrievers(limit=args.limit, top_k=args.top_k, batch_size=args.batch_size)
+    elif args.command == "backends":
+        bench_backends(args.backend, limit=args.limit, gen_limit=args.gen_limit)
+    elif args.command == "backend-run":
+        result = run_backend(args.backend, limit=args.limit, gen_limit=args.gen_limit)
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(result, f)
+
+
+if __name__ == "__main__":
+    main()
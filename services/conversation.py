@@ -0,0 +1,168 @@
+"""
+Multi-turn context for the RAG path.
+
+Per-session history lives in the session store under "conversation":
+
+    {
+        "turns": [{"q": <standalone question>, "a": <first sentence of answer>}, ...],
+        "last": {"standalone": ..., "evidence": [{"id", "score"}, ...]}
+    }
+
+Follow-ups ("what about CSE?", "what is its fee?") are rewritten into a
+standalone question from the previous turn before retrieval. When the
+rewritten question embeds close to the previous one, the previous
+turn's reranked evidence is reloaded by id and retrieval + rerank are
+skipped. Query vectors are not stored; embed_query's LRU has them.
+"""
+import os
+import re
+
+import numpy as np
+
+from services.rag import count_tokens, embed_query, load_evidence
+
+# ------------------ CONFIG ------------------
+HISTORY_TOKEN_BUDGET = int(os.getenv("RAG_HISTORY_TOKENS", "96"))
+HISTORY_MAX_TURNS = int(os.getenv("RAG_HISTORY_MAX_TURNS", "6"))
+# Cosine similarity to the previous question above which its evidence is reused
+FOLLOWUP_REUSE_SIM = float(os.getenv("RAG_FOLLOWUP_REUSE_SIM", "0.85"))
+
+# "IT" is matched separately and only in capitals; "it" is a pronoun
+BRANCHES = [
+    "cse", "ece", "eee", "mech", "mechanical", "civil", "csd", "csm",
+    "aiml", "ai&ml", "ai ml", "data science", "cyber security",
+]
+BRANCH_RE = re.compile(
+    r"\b((?i:" + "|".join(re.escape(b) for b in sorted(BRANCHES, key=len, reverse=True)) + r")|IT)\b"
+)
+FOLLOW_UP_RE = re.compile(r"^\s*(what about|how about|and|also|same for|what of)\b[\s,]*", re.IGNORECASE)
+FILLER_RE = re.compile(r"^((for|in|of|on|with|the)\s*)*$", re.IGNORECASE)
+PRONOUN_RE = re.compile(r"\b((?i:its|they|them|their|those|these|that one|this one)|it|It)\b")
+SENTENCE_END_RE = re.compile(r"(?<=[.!?])\s")
+
+_stats = {"turns": 0, "follow_ups": 0, "rewritten": 0, "evidence_reused": 0}
+
+
+# ------------------ FOLLOW-UPS ------------------
+def is_follow_up(query: str, turns) -> bool:
+    """
+    Only an explicit marker ("what about ...") or a pronoun with nothing
+    in the question to refer to makes a follow-up. Short questions
+    ("fee structure?") are standalone.
+    """
+    if not turns:
+        return False
+    if FOLLOW_UP_RE.match(query):
+        return True
+    return PRONOUN_RE.search(query) is not None and not BRANCH_RE.search(query)
+
+
+def rewrite_query(query: str, previous: str) -> str:
+    """
+    Standalone version of a follow-up, built from the previous question:
+
+        "what about ECE?" after "placements in CSE?"  -> "placements in ECE"
+        "what is its fee?" after "tell me about CSD"  -> "what is its fee (tell me about CSD)"
+    """
+    remainder = FOLLOW_UP_RE.sub("", query).strip().rstrip("?").strip()
+    previous = previous.strip().rstrip("?")
+
+    new_branch = BRANCH_RE.search(remainder)
+    if new_branch and BRANCH_RE.search(previous):
+        # Same question about another branch
+        rest = BRANCH_RE.sub("", remainder).strip(" ,")
+        standalone = BRANCH_RE.sub(new_branch.group(1), previous, count=1)
+        return standalone if FILLER_RE.match(rest) else f"{standalone} {rest}"
+
+    return f"{remainder} ({previous})"
+
+
+def _branches(text: str):
+    return {m.lower() for m in BRANCH_RE.findall(text)}
+
+
+# ------------------ HISTORY ------------------
+def _first_sentence(text: str) -> str:
+    return SENTENCE_END_RE.split((text or "").strip(), maxsplit=1)[0]
+
+
+def compress_history(turns, budget=None) -> str:
+    """
+    The most recent turns that fit in `budget` generator tokens, as
+    "Q: ... / A: ..." lines, oldest first. Answers are already cut to
+    their first sentence when recorded.
+    """
+    budget = HISTORY_TOKEN_BUDGET if budget is None else budget
+
+    lines = []
+    used = 0
+    for turn in reversed(turns):
+        line = f"Q: {turn['q']}\nA: {turn['a']}"
+        cost = count_tokens(line) + 1
+        if used + cost > budget:
+            break
+        lines.append(line)
+        used += cost
+
+    return "\n".join(reversed(lines))
+
+
+# ------------------ TURNS ------------------
+def prepare_turn(query: str, state) -> dict:
+    """
+    Returns {"standalone", "history", "reuse_evidence", "follow_up"} for
+    this question, given the session's conversation state.
+    """
+    conv = (state or {}).get("conversation") or {}
+    turns = conv.get("turns", [])
+    last = conv.get("last")
+
+    _stats["turns"] += 1
+    turn = {"standalone": query, "history": "", "reuse_evidence": None, "follow_up": False}
+
+    if not is_follow_up(query, turns):
+        return turn
+
+    _stats["follow_ups"] += 1
+    turn["follow_up"] = True
+    turn["history"] = compress_history(turns)
+
+    if last:
+        turn["standalone"] = rewrite_query(query, last["standalone"])
+        _stats["rewritten"] += 1
+
+        # A different branch needs different documents however close the
+        # embeddings are ("placements in CSE" vs "placements in ECE")
+        same_branches = _branches(turn["standalone"]) == _branches(last["standalone"])
+
+        if same_branches and last.get("evidence"):
+            sim = float(np.dot(embed_query(turn["standalone"]), embed_query(last["standalone"])))
+            if sim >= FOLLOWUP_REUSE_SIM:
+                turn["reuse_evidence"] = load_evidence(last["evidence"])
+                if turn["reuse_evidence"] is not None:
+                    _stats["evidence_reused"] += 1
+
+    return turn
+
+
+def record_turn(state, turn: dict, result: dict) -> dict:
+    """Adds the finished turn to the session state and returns the state."""
+    state = dict(state or {})
+    conv = dict(state.get("conversation") or {})
+
+    turns = list(conv.get("turns", []))
+    turns.append({"q": turn["standalone"], "a": _first_sentence(result["answer"])})
+    conv["turns"] = turns[-HISTORY_MAX_TURNS:]
+
+    # Ids only; documents are reloaded if a follow-up reuses them
+    conv["last"] = {
+        "standalone": turn["standalone"],
+        "evidence": [{"id": r["id"], "score": float(r["score"])} for r in result["evidence"]],
+    }
+
+    state["conversation"] = conv
+    return state
+
+
+def conversation_stats() -> dict:
+    return dict(_stats)
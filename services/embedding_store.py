@@ -0,0 +1,185 @@
+"""
+Compact on-disk embedding store.
+
+An embedding set is a sidecar plus the matrix file it names:
+
+    <prefix>.meta.json  {"matrix", "version", "ids": [...], "dtype", "dim", "count", "records": [...]}
+    <prefix>.v<N>.npy   float32 / float16 matrix, one row per item
+
+Each save writes a new versioned matrix and then swaps the sidecar in
+with one rename, so readers always get a matching pair. The previous
+matrix is kept for readers that still have it mapped. Sets written
+before versioning (matrix at <prefix>.npy, no "matrix" key) still load.
+
+The matrix is memory-mapped on load, so opening it costs no parsing and
+pages are only read when rows are touched.
+
+Convert the old JSON files with
+
+    python -m services.embedding_store convert data/embeddings/faq_embeddings.json
+    python -m services.embedding_store convert data/embeddings/web_embeddings.json --dtype float16
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+DTYPES = ("float32", "float16")
+
+
+# ---------------- PATHS ----------------
+def _meta_path(prefix):
+    return prefix + ".meta.json"
+
+
+def _read_meta(prefix):
+    try:
+        with open(_meta_path(prefix), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _matrix_path(prefix, meta):
+    name = (meta or {}).get("matrix")
+    if name is None:
+        return prefix + ".npy"          # unversioned set
+    return os.path.join(os.path.dirname(os.path.abspath(prefix)), name)
+
+
+def store_paths(prefix):
+    """(matrix path, sidecar path) of the current version."""
+    return _matrix_path(prefix, _read_meta(prefix)), _meta_path(prefix)
+
+
+def exists(prefix) -> bool:
+    return all(os.path.exists(p) for p in store_paths(prefix))
+
+
+# ---------------- SAVE / LOAD ----------------
+def save_embeddings(prefix, ids, vectors, records=None, dtype="float32", dim=None):
+    """
+    Write `vectors` (n x dim) and their `ids`. `records` is an optional
+    list of small per-row metadata dicts kept in the sidecar. An empty
+    set is stored as a 0 x dim matrix (dim 0 unless given).
+    """
+    if dtype not in DTYPES:
+        raise ValueError(f"dtype must be one of {DTYPES}")
+
+    if len(ids) == 0:
+        matrix = np.zeros((0, dim or 0), dtype=dtype)
+    else:
+        matrix = np.ascontiguousarray(np.asarray(vectors, dtype=dtype))
+    if matrix.ndim != 2 or matrix.shape[0] != len(ids):
+        raise ValueError(f"expected {len(ids)} x dim matrix, got shape {matrix.shape}")
+
+    meta_path = _meta_path(prefix)
+    directory = os.path.dirname(os.path.abspath(meta_path))
+    os.makedirs(directory, exist_ok=True)
+
+    previous = _read_meta(prefix)
+    version = (previous or {}).get("version", 0) + 1
+    matrix_name = f"{os.path.basename(prefix)}.v{version}.npy"
+
+    # The matrix goes to a fresh file; only the sidecar rename below makes
+    # it current, so the pair changes in one atomic step
+    np.save(os.path.join(directory, matrix_name), matrix)
+    with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump({
+            "matrix": matrix_name,
+            "version": version,
+            "ids": list(ids),
+            "dtype": dtype,
+            "dim": int(matrix.shape[1]),
+            "count": len(ids),
+            "records": records,
+        }, f, ensure_ascii=False)
+    os.replace(meta_path + ".tmp", meta_path)
+
+    # Keep this and the previous matrix (it may still be mapped); drop older
+    keep = {matrix_name, os.path.basename(_matrix_path(prefix, previous))}
+    stem = os.path.basename(prefix) + "."
+    for fname in os.listdir(directory):
+        if fname.startswith(stem) and fname.endswith(".npy") and fname not in keep:
+            os.remove(os.path.join(directory, fname))
+
+
+def load_embeddings(prefix, mmap=True):
+    """Returns (ids, matrix, records). The matrix is read-only when mmapped."""
+    meta = _read_meta(prefix)
+    if meta is None:
+        raise FileNotFoundError(_meta_path(prefix))
+
+    matrix = np.load(_matrix_path(prefix, meta), mmap_mode="r" if mmap else None)
+    return meta["ids"], matrix, meta.get("records")
+
+
+# ---------------- JSON CONVERTER ----------------
+def convert_json(json_path, prefix=None, dtype="float32"):
+    """
+    Convert a legacy `[{"embedding": [...], ...}, ...]` file. IDs come
+    from "id", or "faq_id" formatted like the Chroma FAQ IDs; all other
+    fields are kept as records.
+    """
+    prefix = prefix or os.path.splitext(json_path)[0]
+
+    start = time.perf_counter()
+    with open(json_path, encoding="utf-8") as f:
+        rows = json.load(f)
+    parse_s = time.perf_counter() - start
+
+    ids, vectors, records = [], [], []
+    for i, row in enumerate(rows):
+        if "id" in row:
+            ids.append(row["id"])
+        elif "faq_id" in row:
+            ids.append(f"faq_{row['faq_id']:05d}")
+        else:
+            ids.append(str(i))
+        vectors.append(row["embedding"])
+        records.append({k: v for k, v in row.items() if k != "embedding"})
+
+    # Drop the sidecar records when they only repeat the IDs
+    if all(set(r) <= {"id"} for r in records):
+        records = None
+
+    save_embeddings(prefix, ids, vectors, records=records, dtype=dtype)
+
+    start = time.perf_counter()
+    load_embeddings(prefix)
+    load_s = time.perf_counter() - start
+
+    npy_path, _ = store_paths(prefix)
+    print(f"✅ {json_path} -> {npy_path}")
+    print(f"   {len(ids)} vectors, {os.path.getsize(json_path) / 1e6:.1f} MB JSON "
+          f"-> {os.path.getsize(npy_path) / 1e6:.1f} MB {dtype}")
+    print(f"   json.load {parse_s * 1000:.0f} ms -> mmap load {load_s * 1000:.1f} ms")
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Embedding store utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("convert", help="convert a JSON embeddings file to .npy + .meta.json")
+    p.add_argument("json_path")
+    p.add_argument("--prefix", default=None)
+    p.add_argument("--dtype", choices=DTYPES, default="float32")
+
+    p = sub.add_parser("info", help="describe a stored embedding set")
+    p.add_argument("prefix")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        convert_json(args.json_path, args.prefix, args.dtype)
+    elif args.command == "info":
+        ids, matrix, records = load_embeddings(args.prefix)
+        print(f"{len(ids)} x {matrix.shape[1] if matrix.ndim == 2 else 0} {matrix.dtype}, "
+              f"records: {'yes' if records else 'no'}")
+
+
+if __name__ == "__main__":
+    main()
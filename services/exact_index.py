@@ -0,0 +1,75 @@
+import numpy as np
+
+
+# ---------------- EXACT INDEX ----------------
+class ExactIndex:
+    """
+    Brute-force cosine search over one contiguous float32 matrix.
+
+    For a few hundred FAQ rows and web chunks a single matmul plus
+    argpartition is cheaper than an HNSW lookup through Chroma. `query`
+    takes the same arguments and returns the same shape as
+    chromadb's Collection.query, so it can be passed to rag.retrieve in
+    place of a collection.
+    """
+
+    def __init__(self, ids, matrix, documents, metadatas, name=None):
+        matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+
+        self.name = name
+        self.ids = list(ids)
+        self.matrix = matrix / norms
+        self.documents = list(documents)
+        self.metadatas = list(metadatas)
+
+    @classmethod
+    def from_collection(cls, collection):
+        data = collection.get(include=["embeddings", "documents", "metadatas"])
+        return cls(
+            data["ids"],
+            np.asarray(data["embeddings"], dtype=np.float32),
+            data["documents"],
+            data["metadatas"],
+            name=collection.name
+        )
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    # ---------------- SEARCH ----------------
+    def search(self, query_embeddings, top_k=30):
+        """
+        Top-k for every row of `query_embeddings` (n x dim, unit length).
+        Returns (indices, distances), each n x k, best first, where
+        distance is cosine distance like Chroma's "cosine" space.
+        """
+        queries = np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32))
+        k = min(top_k, len(self.ids))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(int), empty
+
+        sims = queries @ self.matrix.T                       # n x N
+
+        if k < sims.shape[1]:
+            part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+        else:
+            part = np.tile(np.arange(sims.shape[1]), (len(queries), 1))
+
+        part_sims = np.take_along_axis(sims, part, axis=1)
+        order = np.argsort(-part_sims, axis=1)
+
+        indices = np.take_along_axis(part, order, axis=1)
+        distances = 1.0 - np.take_along_axis(part_sims, order, axis=1)
+        return indices, distances
+
+    def query(self, query_embeddings, n_results=10, include=None):
+        indices, distances = self.search(query_embeddings, n_results)
+        return {
+            "ids": [[self.ids[i] for i in row] for row in indices],
+            "documents": [[self.documents[i] for i in row] for row in indices],
+            "metadatas": [[self.metadatas[i] for i in row] for row in indices],
+            "distances": [[float(d) for d in row] for row in distances],
+        }
@@ -0,0 +1,142 @@
+"""
+Inference backends for the embedder, reranker and generator.
+
+    torch       fp32 PyTorch (default)
+    torch-int8  PyTorch with dynamic int8 quantization of Linear layers
+    onnx        ONNX Runtime, exported once into models_cache/onnx/
+
+Pick one with INFERENCE_BACKEND. Export the ONNX models ahead of time with
+
+    python -m services.inference_backends export
+"""
+import argparse
+import os
+
+from services.model_registry import (
+    EMBED_MODEL,
+    LLM_MODEL,
+    PROJECT_ROOT,
+    RERANK_MODEL,
+)
+
+# ---------------- CONFIG ----------------
+BACKENDS = ("torch", "torch-int8", "onnx")
+
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "torch")
+if INFERENCE_BACKEND not in BACKENDS:
+    raise ValueError(f"INFERENCE_BACKEND must be one of {BACKENDS}, got {INFERENCE_BACKEND!r}")
+
+ONNX_CACHE_DIR = os.path.join(PROJECT_ROOT, "models_cache", "onnx")
+
+
+def onnx_model_dir(model_name: str) -> str:
+    return os.path.join(ONNX_CACHE_DIR, model_name.replace("/", "__"))
+
+
+def _quantize(module):
+    import torch
+    return torch.quantization.quantize_dynamic(module, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+# ---------------- EMBEDDER ----------------
+def load_embedder(backend=None):
+    from sentence_transformers import SentenceTransformer
+
+    backend = backend or INFERENCE_BACKEND
+
+    if backend == "onnx":
+        local_dir = onnx_model_dir(EMBED_MODEL)
+        if os.path.isdir(local_dir):
+            return SentenceTransformer(local_dir, backend="onnx")
+        model = SentenceTransformer(EMBED_MODEL, backend="onnx")
+        model.save_pretrained(local_dir)
+        return model
+
+    model = SentenceTransformer(EMBED_MODEL)
+    if backend == "torch-int8":
+        model = _quantize(model)
+    return model
+
+
+# ---------------- RERANKER ----------------
+def load_reranker(backend=None):
+    from sentence_transformers import CrossEncoder
+
+    backend = backend or INFERENCE_BACKEND
+
+    if backend == "onnx":
+        local_dir = onnx_model_dir(RERANK_MODEL)
+        if os.path.isdir(local_dir):
+            return CrossEncoder(local_dir, backend="onnx")
+        model = CrossEncoder(RERANK_MODEL, backend="onnx")
+        model.save_pretrained(local_dir)
+        return model
+
+    model = CrossEncoder(RERANK_MODEL)
+    if backend == "torch-int8":
+        model.model = _quantize(model.model)
+    return model
+
+
+# ---------------- GENERATOR ----------------
+def load_generator(backend=None):
+    """Returns (tokenizer, model)."""
+    from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+
+    backend = backend or INFERENCE_BACKEND
+    tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL)
+
+    if backend == "onnx":
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError(
+                "INFERENCE_BACKEND=onnx needs optimum: pip install optimum[onnxruntime]"
+            ) from e
+
+        local_dir = onnx_model_dir(LLM_MODEL)
+        if os.path.isdir(local_dir):
+            return tokenizer, ORTModelForSeq2SeqLM.from_pretrained(local_dir)
+        model = ORTModelForSeq2SeqLM.from_pretrained(LLM_MODEL, export=True)
+        model.save_pretrained(local_dir)
+        tokenizer.save_pretrained(local_dir)
+        return tokenizer, model
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(LLM_MODEL)
+    if backend == "torch-int8":
+        model = _quantize(model)
+    return tokenizer, model
+
+
+LOADERS = {
+    "embedder": load_embedder,
+    "reranker": load_reranker,
+    "generator": load_generator,
+}
+
+
+# ---------------- EXPORT ----------------
+def export_onnx(names=None):
+    """One-time export of the ONNX models into ONNX_CACHE_DIR."""
+    os.makedirs(ONNX_CACHE_DIR, exist_ok=True)
+    for name in names or LOADERS:
+        print(f"📦 Exporting {name} to ONNX...")
+        LOADERS[name]("onnx")
+    print(f"✅ ONNX models cached in {ONNX_CACHE_DIR}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inference backend utilities")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("export", help="export ONNX models into the local cache")
+    p.add_argument("--models", nargs="*", choices=list(LOADERS), default=None)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        export_onnx(args.models)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+BM25 lexical index over FAQ combined_text and web chunk text.
+
+Built once at ingestion time by database/vectordb/vectordb.py and saved
+as JSON next to the vector DB. At query time its ranking is fused with
+the dense results (reciprocal rank fusion) so exact terms such as
+"EAMCET code", "TKRC" or "CSD" are not missed.
+"""
+import heapq
+import json
+import math
+import os
+import re
+from collections import Counter, defaultdict
+
+TOKEN_RE = re.compile(r"[A-Za-z0-9]+")
+# Bumped whenever tokenize() changes, so saved indexes get rebuilt
+TOKENIZER_VERSION = 2
+
+# Very common words carry no signal for BM25 and only bloat postings
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "do", "for", "from",
+    "how", "i", "in", "is", "it", "of", "on", "or", "the", "to", "what",
+    "when", "where", "which", "who", "with", "you", "your",
+}
+# Stopwords that are also branch codes when written in capitals
+KEEP_UPPERCASE = {"IT"}
+
+
+def tokenize(text: str):
+    return [
+        t.lower() for t in TOKEN_RE.findall(text)
+        if t.lower() not in STOPWORDS or t in KEEP_UPPERCASE
+    ]
+
+
+# ---------------- BM25 INDEX ----------------
+class BM25Index:
+    def __init__(self, ids, documents, metadatas, doc_len, postings, idf, k1=1.5, b=0.75):
+        self.ids = ids
+        self.documents = documents
+        self.metadatas = metadatas
+        self.doc_len = doc_len
+        self.postings = postings        # term -> [[doc_index, term_freq], ...]
+        self.idf = idf
+        self.k1 = k1
+        self.b = b
+        self.avgdl = (sum(doc_len) / len(doc_len)) if doc_len else 0.0
+
+    # ---------------- BUILD ----------------
+    @classmethod
+    def build(cls, ids, documents, metadatas, k1=1.5, b=0.75):
+        postings = defaultdict(list)
+        doc_len = []
+
+        for idx, text in enumerate(documents):
+            tokens = tokenize(text)
+            doc_len.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append([idx, tf])
+
+        n = len(documents)
+        idf = {
+            term: math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+            for term, plist in postings.items()
+        }
+
+        return cls(list(ids), list(documents), list(metadatas), doc_len, dict(postings), idf, k1, b)
+
+    # ---------------- PERSISTENCE ----------------
+    def save(self, path):
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "tokenizer": TOKENIZER_VERSION,
+                "k1": self.k1,
+                "b": self.b,
+                "ids": self.ids,
+                "documents": self.documents,
+                "metadatas": self.metadatas,
+                "doc_len": self.doc_len,
+                "postings": self.postings,
+                "idf": self.idf,
+            }, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path):
+        """
+        The saved index, or None if it was built with another tokenizer
+        version: its terms would not match tokenize() on queries.
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+
+        if data.get("tokenizer") != TOKENIZER_VERSION:
+            print(f"⚠ {os.path.basename(path)} was built with tokenizer v{data.get('tokenizer')}, "
+                  f"expected v{TOKENIZER_VERSION}; using dense retrieval only until the vector DB is rebuilt")
+            return None
+
+        return cls(
+            data["ids"], data["documents"], data["metadatas"], data["doc_len"],
+            data["postings"], data["idf"], data["k1"], data["b"]
+        )
+
+    # ---------------- SEARCH ----------------
+    def search(self, query, top_k=30):
+        """Top-k as [(doc_index, score), ...], best first."""
+        scores = defaultdict(float)
+
+        for term in set(tokenize(query)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            idf = self.idf[term]
+            for idx, tf in plist:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_len[idx] / self.avgdl)
+                scores[idx] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+
+
+# ---------------- FUSION ----------------
+def reciprocal_rank_fusion(ranked_lists, k=60, limit=None):
+    """
+    Fuse several best-first lists of (id, document, metadata) tuples.
+    Each item scores sum(1 / (k + rank)) over the lists it appears in.
+    Returns (docs, metas, ids), best first.
+    """
+    scores = defaultdict(float)
+    items = {}
+
+    for ranked in ranked_lists:
+        for rank, (doc_id, doc, meta) in enumerate(ranked, start=1):
+            scores[doc_id] += 1.0 / (k + rank)
+            items.setdefault(doc_id, (doc, meta))
+
+    order = sorted(scores, key=lambda i: -scores[i])[:limit]
+    return [items[i][0] for i in order], [items[i][1] for i in order], order
@@ -0,0 +1,311 @@
+import json
+import os
+import threading
+import time
+
+# ---------------- PATH SETUP ----------------
+CURRENT_FILE = os.path.abspath(__file__)          # services/model_registry.py
+SERVICES_DIR = os.path.dirname(CURRENT_FILE)      # services/
+PROJECT_ROOT = os.path.dirname(SERVICES_DIR)      # project_bot/
+
+VECTOR_DB_PATH = os.path.join(PROJECT_ROOT, "vector_db")
+
+# "chroma" queries the HNSW collections; "exact" loads every vector into
+# one NumPy matrix and does brute-force search (see services/exact_index.py)
+RAG_RETRIEVER = os.getenv("RAG_RETRIEVER", "chroma")
+
+# Written by database/vectordb/vectordb.py at the end of every rebuild
+MANIFEST_PATH = os.path.join(VECTOR_DB_PATH, "manifest.json")
+
+# ---------------- MODEL NAMES ----------------
+EMBED_MODEL = "BAAI/bge-large-en-v1.5"
+
+# Faster but still strong reranker
+RERANK_MODEL = "BAAI/bge-reranker-base"
+
+# Mistral 7B Instruct
+#LLM_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
+LLM_MODEL = "google/flan-t5-large"
+#LLM_MODEL = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+
+
+# ---------------- LAZY MODEL ----------------
+class LazyModel:
+    """
+    Loads a model the first time it is requested.
+    Loading is guarded by a lock so concurrent first requests
+    trigger exactly one load.
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._value = None
+        self._lock = threading.Lock()
+        self.load_seconds = None
+        self.error = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._value is not None
+
+    def get(self):
+        if self._value is not None:
+            return self._value
+
+        with self._lock:
+            if self._value is None:
+                start = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                    self.error = None
+                except Exception as e:
+                    self.error = str(e)
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 2)
+                print(f"✅ Loaded {self.name} in {self.load_seconds}s")
+
+        return self._value
+
+    def reset(self):
+        with self._lock:
+            self._value = None
+            self.load_seconds = None
+
+
+# ---------------- LOADERS ----------------
+# Backend selection (torch / torch-int8 / onnx) lives in
+# services.inference_backends, see INFERENCE_BACKEND.
+def _load_embedder():
+    from services.inference_backends import load_embedder
+    return load_embedder()
+
+
+def _load_reranker():
+    from services.inference_backends import load_reranker
+    return load_reranker()
+
+
+def _load_generator():
+    from services.inference_backends import load_generator
+    #from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    """tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL)
+    generator = AutoModelForCausalLM.from_pretrained(
+       LLM_MODEL,
+       torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
+       device_map="auto"
+    )"""
+    return load_generator()
+
+
+def _load_tokenizer():
+    # Token counting must not require the full generator to be loaded
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(LLM_MODEL)
+
+
+def _load_collections():
+    import chromadb
+
+    # The manifest maps served names to the versioned collections of
+    # the current build; older DBs without a manifest use the plain names.
+    aliases = read_manifest().get("collections", {})
+
+    client = chromadb.PersistentClient(path=VECTOR_DB_PATH)
+    return {
+        name: client.get_collection(aliases.get(name, name))
+        for name in ["faqs_collection", "webdocs_collection"]
+    }
+
+
+def _load_exact_indexes():
+    from services.exact_index import ExactIndex
+
+    collections = REGISTRY["collections"].get()
+    return {name: ExactIndex.from_collection(col) for name, col in collections.items()}
+
+
+# Index files built with an older tokenizer; not re-read on every access
+_stale_lexical = set()
+
+
+def _load_lexical_index():
+    # None (retried on next access) until a build has written the index
+    name = read_manifest().get("lexical_index")
+    if not name or name in _stale_lexical or not os.path.exists(os.path.join(VECTOR_DB_PATH, name)):
+        return None
+
+    from services.lexical_index import BM25Index
+    index = BM25Index.load(os.path.join(VECTOR_DB_PATH, name))
+    if index is None:
+        _stale_lexical.add(name)
+    return index
+
+
+# ---------------- REGISTRY ----------------
+REGISTRY = {
+    "embedder": LazyModel("embedder", _load_embedder),
+    "reranker": LazyModel("reranker", _load_reranker),
+    "generator": LazyModel("generator", _load_generator),
+    "tokenizer": LazyModel("tokenizer", _load_tokenizer),
+    "collections": LazyModel("collections", _load_collections),
+    "exact_index": LazyModel("exact_index", _load_exact_indexes),
+    "lexical_index": LazyModel("lexical_index", _load_lexical_index),
+}
+
+
+def get_embedder():
+    return REGISTRY["embedder"].get()
+
+
+def get_reranker():
+    return REGISTRY["reranker"].get()
+
+
+def get_generator():
+    """Returns (tokenizer, model)."""
+    return REGISTRY["generator"].get()
+
+
+def _sync_build():
+    build_id = current_build_id()
+    if build_id != _manifest_state["loaded_build_id"]:
+        # Vector DB was rebuilt: reopen the collections on next access
+        REGISTRY["collections"].reset()
+        REGISTRY["exact_index"].reset()
+        REGISTRY["lexical_index"].reset()
+        _manifest_state["loaded_build_id"] = build_id
+
+
+def get_tokenizer():
+    """Generator tokenizer, shared with the generator once that is loaded."""
+    if REGISTRY["generator"].loaded:
+        return REGISTRY["generator"].get()[0]
+    return REGISTRY["tokenizer"].get()
+
+
+def get_collection(name: str):
+    _sync_build()
+    return REGISTRY["collections"].get()[name]
+
+
+def get_exact_index(name: str):
+    _sync_build()
+    return REGISTRY["exact_index"].get()[name]
+
+
+def get_lexical_index():
+    """BM25 index of the current build, or None if none was built."""
+    _sync_build()
+    return REGISTRY["lexical_index"].get()
+
+
+def get_searchable(name: str, retriever=None):
+    """
+    The object retrieval should query for `name`: the Chroma collection or
+    its in-process ExactIndex, depending on RAG_RETRIEVER.
+    """
+    if (retriever or RAG_RETRIEVER) == "exact":
+        return get_exact_index(name)
+    return get_collection(name)
+
+
+# ---------------- VECTOR DB MANIFEST ----------------
+_manifest_state = {"mtime": None, "manifest": {}, "loaded_build_id": None}
+
+
+def read_manifest() -> dict:
+    """
+    Returns the vector DB build manifest, re-reading the file only
+    when its mtime changes.
+    """
+    try:
+        mtime = os.path.getmtime(MANIFEST_PATH)
+    except OSError:
+        return {}
+
+    if mtime != _manifest_state["mtime"]:
+        try:
+            with open(MANIFEST_PATH, "r", encoding="utf-8") as f:
+                _manifest_state["manifest"] = json.load(f)
+        except (OSError, ValueError):
+            return _manifest_state["manifest"]
+        _manifest_state["mtime"] = mtime
+
+    return _manifest_state["manifest"]
+
+
+def current_build_id():
+    return read_manifest().get("build_id")
+
+
+# ---------------- WARM-UP / READINESS ----------------
+_warmup_state = {"requested": False, "done": False, "error": None}
+
+
+def warmup(names=None):
+    """
+    Eagerly load the given registry entries (all by default).
+    Safe to call from a background thread at startup.
+    """
+    _warmup_state["requested"] = True
+    _warmup_state["done"] = False
+    _warmup_state["error"] = None
+
+    if names is None:
+        names = [
+            n for n in REGISTRY
+            if n != "tokenizer" and (n != "exact_index" or RAG_RETRIEVER == "exact")
+        ]
+
+    try:
+        for name in names:
+            REGISTRY[name].get()
+    except Exception as e:
+        _warmup_state["error"] = str(e)
+        print(f"❌ Warm-up failed: {e}")
+        return
+
+    _warmup_state["done"] = True
+
+
+def warmup_in_background(names=None):
+    # Mark warm-up as requested before the thread starts so /ready
+    # never reports ready in between.
+    _warmup_state["requested"] = True
+    thread = threading.Thread(
+        target=warmup,
+        args=(names,),
+        name="model-warmup",
+        daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def is_ready() -> bool:
+    """
+    Without warm-up the service is ready immediately and models load
+    on first use. With warm-up it is ready once every model is loaded.
+    """
+    if not _warmup_state["requested"]:
+        return True
+    return _warmup_state["done"]
+
+
+def status() -> dict:
+    return {
+        "ready": is_ready(),
+        "backend": os.getenv("INFERENCE_BACKEND", "torch"),
+        "retriever": RAG_RETRIEVER,
+        "warmup": dict(_warmup_state),
+        "models": {
+            name: {
+                "loaded": entry.loaded,
+                "load_seconds": entry.load_seconds,
+                "error": entry.error,
+            }
+            for name, entry in REGISTRY.items()
+        },
+    }
@@ -1,84 +1,245 @@
-import chromadb
-import torch
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
 import numpy as np
-from sentence_transformers import SentenceTransformer, CrossEncoder
-from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
-#from transformers import AutoTokenizer, AutoModelForCausalLM
+
+from services import batcher
+from services.answer_cache import ANSWER_CACHE_ENABLED, answer_cache
+from services.lexical_index import reciprocal_rank_fusion
+from services.model_registry import (
+    current_build_id,
+    get_collection,
+    get_embedder,
+    get_lexical_index,
+    get_searchable,
+    get_generator,
+    get_reranker,
+    get_tokenizer,
+)
+
+# ------------------ CONFIG ------------------
+# If the top reranked hit is an FAQ scoring at least this much, its stored
+# answer is returned directly and generation is skipped.
+FAQ_FASTPATH_ENABLED = os.getenv("FAQ_FASTPATH_ENABLED", "1") == "1"
+FAQ_FASTPATH_SCORE = float(os.getenv("FAQ_FASTPATH_SCORE", "0.9"))
+
+# Adaptive retrieval: keep only candidates within ADAPTIVE_MARGIN cosine
+# distance of the best hit (at least ADAPTIVE_MIN_CANDIDATES per collection).
+ADAPTIVE_RETRIEVAL = os.getenv("RAG_ADAPTIVE", "0") == "1"
+ADAPTIVE_MARGIN = float(os.getenv("RAG_ADAPTIVE_MARGIN", "0.15"))
+ADAPTIVE_MIN_CANDIDATES = int(os.getenv("RAG_ADAPTIVE_MIN_CANDIDATES", "5"))
+
+# Cascaded rerank: score CASCADE_STEP candidates at a time and stop once
+# the leader is ahead by CASCADE_MARGIN.
+CASCADE_RERANK = os.getenv("RAG_CASCADE_RERANK", "0") == "1"
+CASCADE_STEP = int(os.getenv("RAG_CASCADE_STEP", "8"))
+CASCADE_MARGIN = float(os.getenv("RAG_CASCADE_MARGIN", "0.3"))
+
+# Hybrid retrieval: fuse BM25 with the dense results (reciprocal rank
+# fusion) and rerank only the best RERANK_CANDIDATES of the fused list.
+HYBRID_RETRIEVAL = os.getenv("RAG_HYBRID", "1") == "1"
+LEXICAL_TOP_K = int(os.getenv("RAG_LEXICAL_TOP_K", "30"))
+RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+RERANK_CANDIDATES = int(os.getenv("RAG_RERANK_CANDIDATES", "20"))
+
+# flan-t5 was trained on 512-token inputs. The context gets
+# RAG_CONTEXT_TOKENS of that; the rest is left for the rules and question.
+CONTEXT_TOKEN_BUDGET = int(os.getenv("RAG_CONTEXT_TOKENS", "380"))
+PROMPT_MAX_TOKENS = 512
+DEDUP_THRESHOLD = float(os.getenv("RAG_DEDUP_THRESHOLD", "0.8"))
+
 
 # ------------------ MODEL LOAD ------------------
+# Models and Chroma collections are loaded lazily by services.model_registry
+# the first time a RAG request needs them.
+
+
+# ------------------ QUERY EMBEDDING ------------------
+EMBED_CACHE_SIZE = int(os.getenv("RAG_EMBED_CACHE_SIZE", "1024"))
+
+RETRIEVAL_COLLECTIONS = ["faqs_collection", "webdocs_collection"]
 
-# BGE Embedding model
-embedder = SentenceTransformer("BAAI/bge-large-en-v1.5")
+# Shared pool for querying several collections at once
+_search_pool = ThreadPoolExecutor(max_workers=len(RETRIEVAL_COLLECTIONS), thread_name_prefix="retrieve")
 
-# Faster but still strong reranker
-reranker = CrossEncoder("BAAI/bge-reranker-base")
 
-# Mistral 7B Instruct
-#LLM_MODEL = "mistralai/Mistral-7B-Instruct-v0.2"
-LLM_MODEL = "google/flan-t5-large"
-#LLM_MODEL = "TinyLlama/TinyLlama-1.1B-Chat-v1.0"
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
 
 
-"""tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL)
-generator = AutoModelForCausalLM.from_pretrained(
-   LLM_MODEL,
-   torch_dtype=torch.float16 if torch.cuda.is_available() else torch.float32,
-   device_map="auto"
-)"""
-tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL)
-generator = AutoModelForSeq2SeqLM.from_pretrained(LLM_MODEL)
+@lru_cache(maxsize=EMBED_CACHE_SIZE)
+def _embed_normalized(normalized_query):
+    if batcher.BATCHING_ENABLED:
+        vector = np.asarray(batcher.embed(normalized_query))
+    else:
+        vector = get_embedder().encode(normalized_query, normalize_embeddings=True)
 
+    # Cached arrays are shared between callers
+    vector.setflags(write=False)
+    return vector
 
-# ------------------ CHROMA ------------------
-client = chromadb.PersistentClient(path="vector_db")
-faqs_collection = client.get_collection("faqs_collection")
-webdocs_collection = client.get_collection("webdocs_collection")
 
-sample = webdocs_collection.get(ids=webdocs_collection.peek()["ids"])
+def embed_query(query):
+    """
+    Normalized, unit-length query embedding.
+    Repeated questions are served from an LRU cache keyed on the
+    normalized query text and skip the embedder entirely.
+    """
+    return _embed_normalized(normalize_query(query))
 
-for i, d in enumerate(sample["documents"]):
-    print(f"\n---- DOC {i} ----")
-    print(d[:400])
-    print(sample["metadatas"][i])
+
+def embedding_cache_stats() -> dict:
+    info = _embed_normalized.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "size": info.currsize,
+        "max_size": info.maxsize,
+    }
 
 
 # ------------------ RETRIEVAL ------------------
-def retrieve(collection, query, top_k=30):
-    query_emb = embedder.encode(query, normalize_embeddings=True).tolist()
+def adaptive_cutoff(distances, min_k=None, margin=None):
+    """
+    Number of candidates worth keeping: everything within `margin` cosine
+    distance of the best hit, but never fewer than `min_k`. A tight top-1
+    match therefore yields a short candidate list.
+    """
+    min_k = ADAPTIVE_MIN_CANDIDATES if min_k is None else min_k
+    margin = ADAPTIVE_MARGIN if margin is None else margin
+
+    if not distances:
+        return 0
+
+    limit = distances[0] + margin
+    keep = sum(1 for d in distances if d <= limit)
+    return min(len(distances), max(keep, min_k))
+
+
+def retrieve(collection, query, top_k=30, query_emb=None, adaptive=None, with_distances=False):
+    if query_emb is None:
+        query_emb = embed_query(query)
+    if adaptive is None:
+        adaptive = ADAPTIVE_RETRIEVAL
 
     results = collection.query(
-        query_embeddings=[query_emb],
+        query_embeddings=[np.asarray(query_emb).tolist()],
         n_results=top_k,
-        include=["documents", "metadatas"]  # <-- remove "ids"
+        include=["documents", "metadatas", "distances"]  # <-- remove "ids"
     )
 
     docs = results["documents"][0]
     metas = results["metadatas"][0]
     ids = results["ids"][0]   # <-- still available automatically
+    distances = results["distances"][0]
+
+    # ---- ADAPTIVE CANDIDATE COUNT ----
+    if adaptive:
+        keep = adaptive_cutoff(distances)
+        docs, metas, ids, distances = docs[:keep], metas[:keep], ids[:keep], distances[:keep]
 
     # ---- DEDUPLICATE ----
     seen = set()
     unique_docs = []
     unique_metas = []
     unique_ids = []
+    unique_distances = []
 
-    for d, m, i in zip(docs, metas, ids):
+    for d, m, i, dist in zip(docs, metas, ids, distances):
         if i not in seen and d.strip() != "":
             seen.add(i)
             unique_docs.append(d)
             unique_metas.append(m)
             unique_ids.append(i)
+            unique_distances.append(dist)
+
+    if with_distances:
+        return unique_docs, unique_metas, unique_ids, unique_distances
 
     return unique_docs, unique_metas, unique_ids
 
 
+def search_collections(query_emb, collection_names=None, top_k=30, adaptive=None,
+                       with_distances=False, retriever=None):
+    """
+    Run one precomputed query vector against several collections
+    concurrently. Returns {collection_name: (docs, metas, ids)}, with a
+    fourth distances list when `with_distances` is set.
+
+    `retriever` ("chroma" / "exact") overrides RAG_RETRIEVER.
+    """
+    names = collection_names or RETRIEVAL_COLLECTIONS
+
+    futures = {
+        name: _search_pool.submit(
+            retrieve, get_searchable(name, retriever), None, top_k, query_emb, adaptive, with_distances
+        )
+        for name in names
+    }
+
+    return {name: future.result() for name, future in futures.items()}
+
+
+def merge_by_distance(hits):
+    """Merge per-collection results into one list ordered by dense distance."""
+    merged = []
+    for docs, metas, ids, distances in hits.values():
+        merged.extend(zip(distances, docs, metas, ids))
+    merged.sort(key=lambda x: x[0])
+
+    docs = [m[1] for m in merged]
+    metas = [m[2] for m in merged]
+    ids = [m[3] for m in merged]
+    return docs, metas, ids
+
+
 
 
 # ------------------ RERANK ------------------
-def rerank(query, docs, metas, ids, top_k=5):
-    pairs = [[query, d] for d in docs]
-    scores = reranker.predict(pairs)
-    scores = np.array(scores)
+def score_pairs(pairs):
+    if not pairs:
+        return np.array([])
+    if batcher.BATCHING_ENABLED:
+        return np.array(batcher.rerank_scores(pairs))
+    return np.array(get_reranker().predict(pairs))
+
+
+def cascade_scores(query, docs, step=None, margin=None):
+    """
+    Score `docs` (assumed ordered best-first by dense retrieval) in chunks
+    of `step`, stopping as soon as the best score leads the runner-up by
+    at least `margin`. Unscored documents get -inf.
+    """
+    step = CASCADE_STEP if step is None else step
+    margin = CASCADE_MARGIN if margin is None else margin
+
+    scores = np.full(len(docs), -np.inf)
+    scored = 0
+
+    while scored < len(docs):
+        end = min(scored + step, len(docs))
+        scores[scored:end] = score_pairs([[query, d] for d in docs[scored:end]])
+        scored = end
+
+        if scored >= 2:
+            top2 = np.sort(scores[:scored])[-2:]
+            if top2[1] - top2[0] >= margin:
+                break
+
+    return scores
+
+
+def rerank(query, docs, metas, ids, top_k=5, cascade=None):
+    if cascade is None:
+        cascade = CASCADE_RERANK
+
+    if cascade:
+        scores = cascade_scores(query, docs)
+    else:
+        pairs = [[query, d] for d in docs]
+        scores = score_pairs(pairs)
 
     sorted_idx = np.argsort(-scores)
 
@@ -86,6 +247,8 @@ def rerank(query, docs, metas, ids, top_k=5):
     reranked = []
 
     for i in sorted_idx:
+        if not np.isfinite(scores[i]):
+            break
         text = docs[i].strip()
         if text not in used_texts and text != "":
             reranked.append({
@@ -104,19 +267,113 @@ def rerank(query, docs, metas, ids, top_k=5):
 
 
 # ------------------ AUGMENTATION ------------------
-def build_context(reranked_results):
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+")
+WORD_RE = re.compile(r"[a-z0-9]+")
+
+_context_stats = {"prompts": 0, "context_tokens": 0, "duplicates_dropped": 0, "truncated": 0}
+
+
+def count_tokens(text: str) -> int:
+    """Token count with the generator's own tokenizer."""
+    return len(get_tokenizer()(text, add_special_tokens=False)["input_ids"])
+
+
+def _is_near_duplicate(words, kept, threshold):
+    for other in kept:
+        union = len(words | other)
+        if union and len(words & other) / union >= threshold:
+            return True
+    return False
+
+
+def assemble_context(reranked_results, budget=None):
+    """
+    Build the context from reranked documents, highest score first,
+    until `budget` generator tokens are used. Sentences that nearly
+    repeat one already included (word-set Jaccard >= DEDUP_THRESHOLD)
+    are dropped; a sentence too long for the remaining budget is skipped
+    and shorter ones after it may still fit.
+
+    Returns (context, info) where info records tokens used, documents
+    included, duplicates dropped and whether the budget cut content off.
+    """
+    budget = CONTEXT_TOKEN_BUDGET if budget is None else budget
+    separator_tokens = count_tokens("\n\n---\n\n")
+
     blocks = []
-    for r in reranked_results:
-        text = r["document"]
-        meta = r["metadata"]
-        block = f"Source: {meta.get('source','web')}\nContent:\n{text}"
-        blocks.append(block)
+    kept_words = []
+    used = 0
+    dropped = 0
+    truncated = False
+
+    for r in sorted(reranked_results, key=lambda x: -x["score"]):
+        meta = r["metadata"] or {}
+        header = f"Source: {meta.get('source','web')}\nContent:\n"
+        cost = count_tokens(header) + (separator_tokens if blocks else 0)
+
+        sentences = []
+        for sentence in SENTENCE_SPLIT_RE.split(r["document"].strip()):
+            if used + cost >= budget:
+                truncated = True
+                break
+
+            words = set(WORD_RE.findall(sentence.lower()))
+            if not words:
+                continue
+            if _is_near_duplicate(words, kept_words, DEDUP_THRESHOLD):
+                dropped += 1
+                continue
+
+            sentence_tokens = count_tokens(sentence) + 1
+            if used + cost + sentence_tokens > budget:
+                truncated = True
+                continue
+
+            sentences.append(sentence)
+            kept_words.append(words)
+            cost += sentence_tokens
+
+        if sentences:
+            blocks.append(header + " ".join(sentences))
+            used += cost
+
+        if used >= budget:
+            break
+
+    _context_stats["prompts"] += 1
+    _context_stats["context_tokens"] += used
+    _context_stats["duplicates_dropped"] += dropped
+    _context_stats["truncated"] += int(truncated)
+
+    return "\n\n---\n\n".join(blocks), {
+        "tokens_used": used,
+        "budget": budget,
+        "documents_used": len(blocks),
+        "duplicates_dropped": dropped,
+        "truncated": truncated,
+    }
+
+
+def build_context(reranked_results):
+    return assemble_context(reranked_results)[0]
+
 
-    return "\n\n---\n\n".join(blocks)
+def context_stats() -> dict:
+    prompts = _context_stats["prompts"]
+    return {
+        **_context_stats,
+        "budget": CONTEXT_TOKEN_BUDGET,
+        "avg_context_tokens": round(_context_stats["context_tokens"] / prompts, 1) if prompts else 0.0,
+    }
 
 
 # ------------------ PROMPT ------------------
-def build_prompt(query, context):
+def build_prompt(query, context, history=""):
+    conversation = f"""
+CONVERSATION SO FAR:
+{history}
+""" if history else ""
+
     prompt = f"""
 You are a highly accurate college assistant chatbot.
 
@@ -129,7 +386,7 @@ RULES:
 
 CONTEXT:
 {context}
-
+{conversation}
 QUESTION:
 {query}
 
@@ -139,60 +396,325 @@ FINAL ANSWER:
 
 
 # ------------------ GENERATION ------------------
+GENERATION_KWARGS = {
+    "max_new_tokens": 150,
+    "temperature": 0.9,
+    "top_p": 0.95,
+    "do_sample": False,
+}
+
+
 def generate_llama_answer(prompt):
+    if batcher.BATCHING_ENABLED:
+        return batcher.generate(prompt, **GENERATION_KWARGS)
+
+    tokenizer, generator = get_generator()
 
-    inputs = tokenizer(prompt, return_tensors="pt").to(generator.device)
+    inputs = tokenizer(
+        prompt, return_tensors="pt", truncation=True, max_length=PROMPT_MAX_TOKENS
+    ).to(generator.device)
 
     output = generator.generate(
         **inputs,
-        max_new_tokens=150,
-        temperature=0.9,
-        top_p=0.95,
-        do_sample=False
+        **GENERATION_KWARGS
     )
 
     answer = tokenizer.decode(output[0], skip_special_tokens=True)
 
     return answer
-    
 
 
+def stream_llama_answer(prompt, on_text):
+    """
+    Generates on the calling thread, passing decoded text pieces to
+    `on_text` as flan-t5 produces them. Returns the full answer.
+    An exception raised by `on_text` stops generation.
+    """
+    from transformers import TextStreamer
+
+    class CallbackStreamer(TextStreamer):
+        def on_finalized_text(self, text, stream_end=False):
+            if text:
+                on_text(text)
+
+    tokenizer, generator = get_generator()
+
+    inputs = tokenizer(
+        prompt, return_tensors="pt", truncation=True, max_length=PROMPT_MAX_TOKENS
+    ).to(generator.device)
+
+    output = generator.generate(
+        **inputs,
+        **GENERATION_KWARGS,
+        streamer=CallbackStreamer(tokenizer, skip_special_tokens=True)
+    )
+    return tokenizer.decode(output[0], skip_special_tokens=True)
+
+
+
+
+# ------------------ FAQ FAST PATH ------------------
+def faq_fast_path(reranked_results):
+    """
+    Stored answer of the top hit if it is an FAQ above FAQ_FASTPATH_SCORE,
+    otherwise None.
+    """
+    if not FAQ_FASTPATH_ENABLED or not reranked_results:
+        return None
+
+    top = reranked_results[0]
+    meta = top["metadata"] or {}
+
+    if meta.get("type") == "faq" and meta.get("answer") and top["score"] >= FAQ_FASTPATH_SCORE:
+        return meta["answer"]
+
+    return None
+
+
+def load_evidence(refs):
+    """
+    Reranked evidence rebuilt from [{"id", "score"}, ...], the form kept
+    with a conversation turn. None when any document is no longer in the
+    collections (e.g. after a rebuild).
+    """
+    ids = [r["id"] for r in refs]
+    found = {}
+    for name in RETRIEVAL_COLLECTIONS:
+        res = get_collection(name).get(ids=ids, include=["documents", "metadatas"])
+        for i, d, m in zip(res["ids"], res["documents"], res["metadatas"]):
+            found[i] = (d, m)
+
+    if any(i not in found for i in ids):
+        return None
+
+    return [
+        {"score": r["score"], "document": found[r["id"]][0].strip(), "metadata": found[r["id"]][1], "id": r["id"]}
+        for r in refs
+    ]
 
 
 # ------------------ FULL PIPELINE ------------------
-def rag_answer(query):
-    # -------- Retrieve from FAQ --------
-    faq_docs, faq_metas, faq_ids = retrieve(faqs_collection, query)
+def hybrid_candidates(query, hits, limit=None):
+    """
+    Fuse the per-collection dense lists with the BM25 ranking.
+    Returns (docs, metas, ids) best first, or None without a lexical index.
+    """
+    lexical = get_lexical_index()
+    if lexical is None:
+        return None
+
+    ranked_lists = [
+        list(zip(ids, docs, metas))
+        for docs, metas, ids, _ in hits.values()
+    ]
+    ranked_lists.append([
+        (lexical.ids[i], lexical.documents[i], lexical.metadatas[i])
+        for i, _ in lexical.search(query, LEXICAL_TOP_K)
+    ])
+
+    return reciprocal_rank_fusion(ranked_lists, k=RRF_K, limit=limit or RERANK_CANDIDATES)
+
+
+def retrieve_and_rerank(query, query_emb, top_k=5, adaptive=None, cascade=None, hybrid=None):
+    if cascade is None:
+        cascade = CASCADE_RERANK
+    if hybrid is None:
+        hybrid = HYBRID_RETRIEVAL
+
+    hits = search_collections(query_emb, adaptive=adaptive, with_distances=True)
 
-    # -------- Retrieve from Web --------
-    web_docs, web_metas, web_ids = retrieve(webdocs_collection, query)
+    fused = hybrid_candidates(query, hits) if hybrid else None
 
     # -------- Merge Results --------
-    all_docs = faq_docs + web_docs
-    all_metas = faq_metas + web_metas
-    all_ids = faq_ids + web_ids
+    # The cascade needs the best candidates first
+    if fused is not None:
+        all_docs, all_metas, all_ids = fused
+    elif cascade:
+        all_docs, all_metas, all_ids = merge_by_distance(hits)
+    else:
+        all_docs, all_metas, all_ids = [], [], []
+        for docs, metas, ids, _ in hits.values():
+            all_docs += docs
+            all_metas += metas
+            all_ids += ids
 
     # -------- Rerank Combined --------
-    reranked = rerank(query, all_docs, all_metas, all_ids, top_k=5)
+    return rerank(query, all_docs, all_metas, all_ids, top_k=top_k, cascade=cascade)
+
+
+def prepare_answer(query, history="", reuse_evidence=None, follow_up=False):
+    """
+    Everything up to generation: answer cache, embedding, retrieval,
+    rerank and the FAQ fast path.
+
+    `history` is compressed conversation history for the prompt; its
+    tokens come out of the context budget. `reuse_evidence` is an
+    already reranked evidence list (a follow-up on the same documents),
+    which skips retrieval and rerank. `follow_up` marks a query that was
+    rewritten from the conversation.
+
+    Conversational turns bypass the answer cache and the FAQ fast path:
+    reused evidence still carries the previous turn's rerank scores, so
+    the fast path would replay the previous answer, and a rewritten query
+    embeds close to the previous one, so the semantic cache would too.
+
+    Returns (result, plan). `result` is a finished answer dict when no
+    generation is needed; otherwise it is None and `plan` holds the
+    prompt, evidence and cache key for the generation step.
+    """
+    cache_key = normalize_query(query)
+    conversational = follow_up or bool(history) or reuse_evidence is not None
+    use_cache = ANSWER_CACHE_ENABLED and not conversational
+
+    if use_cache:
+        answer_cache.sync_build(current_build_id())
+
+        hit = answer_cache.get_exact(cache_key)
+        if hit is not None:
+            return {"answer": hit["answer"], "evidence": hit["evidence"], "source": "cache"}, None
+
+    # -------- Embed once --------
+    query_emb = embed_query(query)
+
+    if use_cache:
+        hit = answer_cache.get_similar(query_emb)
+        if hit is not None:
+            return {"answer": hit["answer"], "evidence": hit["evidence"], "source": "cache"}, None
+
+    # -------- Retrieve from FAQ + Web (concurrently) --------
+    if reuse_evidence is not None:
+        reranked = reuse_evidence
+    else:
+        reranked = retrieve_and_rerank(query, query_emb)
 
     if len(reranked) == 0:
-        return "I do not know.", []
+        return {"answer": "I do not know.", "evidence": [], "source": "generated"}, None
+
+    # -------- FAQ Fast Path --------
+    faq_answer = None if conversational else faq_fast_path(reranked)
+    if faq_answer is not None:
+        if use_cache:
+            answer_cache.put(cache_key, query_emb, faq_answer, reranked)
+        return {"answer": faq_answer, "evidence": reranked, "source": "faq"}, None
 
     # -------- Build Context --------
-    context = build_context(reranked)
+    budget = CONTEXT_TOKEN_BUDGET
+    if history:
+        budget = max(budget - count_tokens(history), 0)
+    context, context_info = assemble_context(reranked, budget=budget)
 
     # -------- Prompt --------
-    prompt = build_prompt(query, context)
+    prompt = build_prompt(query, context, history)
+
+    return None, {
+        "prompt": prompt,
+        "context": context_info,
+        "evidence": reranked,
+        "cache_key": cache_key,
+        "query_emb": query_emb,
+        "cacheable": use_cache,
+    }
+
+
+def finish_answer(plan, answer):
+    # Answers shaped by the conversation are not reused for other sessions
+    if plan["cacheable"]:
+        answer_cache.put(plan["cache_key"], plan["query_emb"], answer, plan["evidence"])
+    return {
+        "answer": answer,
+        "evidence": plan["evidence"],
+        "source": "generated",
+        "context_tokens": plan["context"]["tokens_used"],
+    }
+
+
+def rag_answer_detailed(query, history="", reuse_evidence=None, follow_up=False):
+    """
+    Full RAG pipeline with the answer cache in front of it.
+
+    Returns a dict with `answer`, `evidence` and `source`, where source is
+    "cache" for exact / semantic cache hits, "faq" when a stored FAQ answer
+    was returned by the fast path and "generated" otherwise.
+    """
+    result, plan = prepare_answer(query, history, reuse_evidence, follow_up)
+    if result is not None:
+        return result
 
     # -------- Generate --------
-    answer = generate_llama_answer(prompt)
+    answer = generate_llama_answer(plan["prompt"])
+
+    return finish_answer(plan, answer)
+
+
+def rag_answer(query):
+    result = rag_answer_detailed(query)
+    return result["answer"], result["evidence"]
+
 
-    return answer, reranked
+# ------------------ STREAMING PIPELINE ------------------
+def source_summary(evidence):
+    """Compact, JSON-safe description of the evidence for clients."""
+    sources = []
+    for r in evidence:
+        meta = r["metadata"] or {}
+        sources.append({
+            "id": r["id"],
+            "score": round(float(r["score"]), 4),
+            "type": meta.get("type", "web"),
+            "source_url": meta.get("source_url"),
+            "question": meta.get("question"),
+        })
+    return sources
+
+
+def rag_answer_stream(query, emit, history="", reuse_evidence=None, follow_up=False,
+                      on_finish=None):
+    """
+    Same pipeline as rag_answer_detailed, passing events to `emit` as
+    they happen:
+
+        {"type": "sources", "sources": [...]}
+        {"type": "token", "text": "..."}        (repeated)
+        {"type": "done", "answer": "...", "source": "..."}
+
+    Everything, generation included, runs on the calling thread, so
+    running this inside the inference pool keeps it within the pool's
+    concurrency limit (see InferencePool.stream). `on_finish`, if given,
+    is called with the full result dict before the done event.
+    """
+    result, plan = prepare_answer(query, history, reuse_evidence, follow_up)
+
+    if result is not None:
+        emit({"type": "sources", "sources": source_summary(result["evidence"])})
+        emit({"type": "token", "text": result["answer"]})
+        if on_finish is not None:
+            on_finish(result)
+        emit({"type": "done", "answer": result["answer"], "source": result["source"]})
+        return
+
+    emit({"type": "sources", "sources": source_summary(plan["evidence"])})
+
+    answer = stream_llama_answer(plan["prompt"], lambda text: emit({"type": "token", "text": text}))
+
+    result = finish_answer(plan, answer.strip())
+    if on_finish is not None:
+        on_finish(result)
+    emit({"type": "done", "answer": result["answer"], "source": result["source"]})
 
 
 
 # ------------------ TEST ------------------
 if __name__ == "__main__":
+    faqs_collection = get_collection("faqs_collection")
+    webdocs_collection = get_collection("webdocs_collection")
+
+    sample = webdocs_collection.get(ids=webdocs_collection.peek()["ids"])
+
+    for i, d in enumerate(sample["documents"]):
+        print(f"\n---- DOC {i} ----")
+        print(d[:400])
+        print(sample["metadatas"][i])
+
     query = "What is the admission procedure?"
     
     answer, evidence = rag_answer(query)
@@ -207,10 +729,9 @@ if __name__ == "__main__":
         print(r["document"][:250], "...")
         print("------------------------------------------")
 
-print("FAQ count:", faqs_collection.count())
-print("Web count:", webdocs_collection.count())
+    print("FAQ count:", faqs_collection.count())
+    print("Web count:", webdocs_collection.count())
 
-res = webdocs_collection.peek()
-print(len(res["ids"]))
-print(len(set(res["ids"])))
-  
\ No newline at end of file
+    res = webdocs_collection.peek()
+    print(len(res["ids"]))
+    print(len(set(res["ids"])))
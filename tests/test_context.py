@@ -0,0 +1,36 @@
+from services import rag
+
+
+def _doc(doc_id, text, score):
+    return {"id": doc_id, "document": text, "metadata": {"source": doc_id}, "score": score}
+
+
+def test_oversized_sentence_is_skipped_not_final(monkeypatch):
+    monkeypatch.setattr(rag, "count_tokens", lambda text: len(text.split()))
+
+    long_sentence = " ".join(["placement"] * 60) + "."
+    docs = [
+        _doc("fees", f"Tuition is 1,00,000 per year. {long_sentence} Hostel is extra.", 0.9),
+        _doc("intake", "CSE intake is 180 seats.", 0.8),
+    ]
+
+    context, info = rag.assemble_context(docs, budget=40)
+
+    assert "Hostel is extra." in context
+    assert "CSE intake is 180 seats." in context
+    assert "placement placement" not in context
+    assert info["documents_used"] == 2
+    assert info["truncated"]
+    assert info["tokens_used"] <= 40
+
+
+def test_stops_once_budget_is_used(monkeypatch):
+    monkeypatch.setattr(rag, "count_tokens", lambda text: len(text.split()))
+
+    docs = [_doc(f"d{i}", f"Fact number {i} about admissions here.", 1 - i / 10) for i in range(10)]
+
+    _, info = rag.assemble_context(docs, budget=30)
+
+    assert info["tokens_used"] <= 30
+    assert info["documents_used"] < 10
+    assert info["truncated"]
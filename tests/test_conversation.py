@@ -0,0 +1,94 @@
+"""
+Two-turn follow-ups through services.conversation and services.rag.
+
+The model-backed steps (embedding, retrieval + rerank, token counting,
+generation) are replaced with deterministic functions so the caching
+and fast-path decisions around them can be checked without the models.
+"""
+import numpy as np
+import pytest
+
+from services import conversation, rag
+from services.answer_cache import AnswerCache
+
+FAQ_HIT = {
+    "id": "faq-cse-fee",
+    "document": "Q: What is the fee for CSE?\nA: The CSE tuition fee is 1,00,000 per year.",
+    "metadata": {
+        "type": "faq",
+        "source": "faq",
+        "question": "What is the fee for CSE?",
+        "answer": "The CSE tuition fee is 1,00,000 per year.",
+    },
+    "score": 0.97,
+}
+
+
+def _word_count(text):
+    return len(text.split())
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    cache = AnswerCache(max_size=16, ttl_seconds=60, similarity_threshold=0.95)
+    prompts = []
+
+    # Every query embeds to the same unit vector: a follow-up is as close
+    # to the previous question as it can be.
+    vector = np.ones(8, dtype=np.float32) / np.sqrt(8)
+
+    monkeypatch.setattr(rag, "answer_cache", cache)
+    monkeypatch.setattr(rag, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(rag, "FAQ_FASTPATH_ENABLED", True)
+    monkeypatch.setattr(rag, "current_build_id", lambda: "test-build")
+    monkeypatch.setattr(rag, "embed_query", lambda query: vector)
+    monkeypatch.setattr(rag, "retrieve_and_rerank", lambda query, query_emb: [dict(FAQ_HIT)])
+    monkeypatch.setattr(rag, "count_tokens", _word_count)
+    monkeypatch.setattr(rag, "generate_llama_answer", lambda prompt: prompts.append(prompt) or "generated")
+
+    monkeypatch.setattr(conversation, "embed_query", lambda query: vector)
+    monkeypatch.setattr(conversation, "count_tokens", _word_count)
+    monkeypatch.setattr(
+        conversation, "load_evidence",
+        lambda refs: [dict(FAQ_HIT, score=ref["score"]) for ref in refs],
+    )
+
+    return cache, prompts
+
+
+def _ask(query, state):
+    turn = conversation.prepare_turn(query, state)
+    result = rag.rag_answer_detailed(turn["standalone"], turn["history"],
+                                     turn["reuse_evidence"], turn["follow_up"])
+    return turn, result, conversation.record_turn(state, turn, result)
+
+
+def test_follow_up_does_not_replay_previous_faq_answer(pipeline):
+    cache, prompts = pipeline
+
+    turn, first, state = _ask("What is the fee for CSE?", {})
+    assert not turn["follow_up"]
+    assert first["source"] == "faq"
+    assert cache.stats()["size"] == 1
+
+    turn, second, state = _ask("Does it include hostel?", state)
+    assert turn["follow_up"]
+    assert turn["reuse_evidence"] is not None
+    assert second["source"] == "generated"
+    assert second["answer"] == "generated"
+    assert "Does it include hostel" in prompts[-1]
+
+    # Nothing read from or written to the shared cache for the follow-up
+    assert cache.stats()["semantic_hits"] == 0
+    assert cache.stats()["size"] == 1
+    assert cache.get_exact(rag.normalize_query(turn["standalone"])) is None
+
+
+def test_standalone_question_still_uses_cache(pipeline):
+    cache, prompts = pipeline
+
+    _ask("What is the fee for CSE?", {})
+    _, again, _ = _ask("What is the fee for CSE?", {})
+
+    assert again["source"] == "cache"
+    assert prompts == []
@@ -0,0 +1,205 @@
+"""
+Crawler and ingest pipeline against a local aiohttp server serving the
+pages in tests/fixtures/site.
+
+The server adds ETags (and answers If-None-Match with 304), a 500 page
+(/broken.html), a page slower than the crawler timeout (/slow.html) and
+404s for anything else.
+"""
+import asyncio
+import hashlib
+import os
+import threading
+from collections import Counter
+from urllib.parse import urlparse
+
+import pytest
+
+web = pytest.importorskip("aiohttp.web")
+pytest.importorskip("bs4")
+
+from database.vectordb.crawler import Crawler, iter_crawl          # noqa: E402
+from database.vectordb.ingest_pipeline import run_pipeline        # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "site")
+SLOW_SECONDS = 2.0
+
+
+# ---------------- FIXTURE SERVER ----------------
+class FixtureSite:
+    def __init__(self):
+        self.base = None
+        self.hits = Counter()
+        self.not_modified = Counter()
+        self.removed = set()            # fixture files to answer with 404
+
+    def url(self, path):
+        return self.base + path
+
+    async def handle(self, request):
+        name = request.match_info["name"]
+        self.hits[name] += 1
+
+        if name == "broken.html":
+            return web.Response(status=500, text="internal error")
+        if name == "slow.html":
+            await asyncio.sleep(SLOW_SECONDS)
+            return web.Response(text="<p>too late</p>", content_type="text/html")
+
+        path = os.path.join(FIXTURE_DIR, name)
+        if name in self.removed or not os.path.isfile(path):
+            return web.Response(status=404, text="not found")
+
+        with open(path, encoding="utf-8") as f:
+            body = f.read().replace("{base}", self.base)
+        if name.endswith(".xml"):
+            return web.Response(text=body, content_type="application/xml")
+
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest() + '"'
+        if request.headers.get("If-None-Match") == etag:
+            self.not_modified[name] += 1
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+
+@pytest.fixture
+def site():
+    fixture = FixtureSite()
+    app = web.Application()
+    app.router.add_get("/{name}", fixture.handle)
+
+    loop = asyncio.new_event_loop()
+    runner = web.AppRunner(app)
+    loop.run_until_complete(runner.setup())
+    loop.run_until_complete(web.TCPSite(runner, "127.0.0.1", 0).start())
+    host, port = runner.addresses[0][:2]
+    fixture.base = f"http://{host}:{port}"
+
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    try:
+        yield fixture
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.run_until_complete(runner.cleanup())
+        loop.close()
+
+
+def crawl(site, cache_dir, seeds=("/index.html",), **kwargs):
+    """{path: result} of one crawl."""
+    results = iter_crawl([site.url(s) for s in seeds], cache_dir=str(cache_dir), **kwargs)
+    return {urlparse(r["url"]).path: r for r in results}
+
+
+# ---------------- SITEMAP / DISCOVERY ----------------
+def test_sitemap_adds_pages_on_allowed_hosts(site, tmp_path):
+    results = crawl(site, tmp_path, use_sitemap=True)
+
+    # sitemap.xml is an index pointing at sitemap-pages.xml
+    assert site.hits["sitemap.xml"] == 1
+    assert site.hits["sitemap-pages.xml"] == 1
+    assert set(results) == {
+        "/index.html", "/about.html", "/admissions.html", "/missing.html", "/broken.html",
+    }
+
+
+def test_link_discovery_stays_on_site(site, tmp_path):
+    results = crawl(site, tmp_path, discover_links=True, max_depth=1)
+
+    # Fragment stripped, PDF and foreign host skipped
+    assert set(results) == {"/index.html", "/about.html", "/admissions.html"}
+    assert all(r["status"] == "fetched" for r in results.values())
+
+
+def test_missing_sitemap_is_not_fatal(site, tmp_path):
+    site.removed.add("sitemap.xml")
+    results = crawl(site, tmp_path, use_sitemap=True)
+
+    assert site.hits["sitemap.xml"] == 1
+    assert set(results) == {"/index.html"}
+
+
+# ---------------- CACHING / ETAG ----------------
+def test_second_crawl_sends_etags_and_serves_cache(site, tmp_path):
+    first = crawl(site, tmp_path, seeds=("/index.html", "/about.html"))
+    assert {r["status"] for r in first.values()} == {"fetched"}
+
+    second = crawl(site, tmp_path, seeds=("/index.html", "/about.html"))
+    assert {r["status"] for r in second.values()} == {"not_modified"}
+    assert site.not_modified == Counter({"index.html": 1, "about.html": 1})
+    for path in first:
+        assert second[path]["html"] == first[path]["html"]
+
+
+def test_failed_pages_are_not_cached(site, tmp_path):
+    crawl(site, tmp_path, seeds=("/missing.html",))
+    again = crawl(site, tmp_path, seeds=("/missing.html",))
+
+    assert again["/missing.html"]["status"] == "failed"
+    assert site.hits["missing.html"] == 2
+    assert not site.not_modified
+
+
+# ---------------- ERROR PATHS ----------------
+def test_http_errors_and_timeouts_are_reported_as_failed(site, tmp_path):
+    crawler = Crawler(
+        [site.url(p) for p in ("/index.html", "/missing.html", "/broken.html", "/slow.html")],
+        cache_dir=str(tmp_path),
+        timeout=SLOW_SECONDS / 4,
+    )
+    results = {}
+    asyncio.run(crawler.crawl(lambda r: results.setdefault(urlparse(r["url"]).path, r)))
+
+    assert results["/index.html"]["status"] == "fetched"
+    for path in ("/missing.html", "/broken.html", "/slow.html"):
+        assert results[path]["status"] == "failed"
+        assert results[path]["html"] is None
+    assert "404" in results["/missing.html"]["error"]
+    assert "500" in results["/broken.html"]["error"]
+    assert crawler.counts == {"fetched": 1, "not_modified": 0, "failed": 3}
+
+
+# ---------------- PIPELINE ----------------
+def pipeline(source):
+    return run_pipeline(
+        [], None,
+        clean_fn=lambda html: " ".join(html.split()),
+        chunk_fn=lambda text: [text],
+        embed_fn=lambda texts: [[float(len(t))] for t in texts],
+        make_id=lambda url, chunk: url,
+        source=source,
+    )
+
+
+def crawl_source(site, cache_dir, **kwargs):
+    for r in iter_crawl([site.url("/index.html")], cache_dir=str(cache_dir), **kwargs):
+        yield r["url"], r["html"], "failed" if r["html"] is None else "fetched"
+
+
+def test_crawl_feeds_pipeline(site, tmp_path):
+    events = list(pipeline(crawl_source(site, tmp_path, discover_links=True)))
+    kinds = Counter(e["kind"] for e in events)
+
+    assert kinds["page"] == 3
+    assert kinds["chunk"] == 3
+    assert events[-1]["kind"] == "report"
+
+
+def test_source_failure_reaches_run_pipeline(site, tmp_path):
+    # A file where the page cache directory should be: the crawler
+    # cannot start, and that error must surface from run_pipeline
+    blocked = tmp_path / "cache"
+    blocked.write_text("not a directory")
+
+    with pytest.raises(OSError):
+        list(pipeline(crawl_source(site, blocked)))
+
+
+def test_source_dying_mid_crawl_reaches_run_pipeline(site, tmp_path):
+    def dying_source():
+        yield from crawl_source(site, tmp_path)
+        raise ConnectionError("crawler lost its connection")
+
+    with pytest.raises(ConnectionError):
+        list(pipeline(dying_source()))
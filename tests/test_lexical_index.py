@@ -0,0 +1,28 @@
+import json
+
+from services.lexical_index import TOKENIZER_VERSION, BM25Index
+
+IDS = ["faq-1", "web-1"]
+DOCS = ["EAMCET code for TKRC is TKRC", "IT branch intake is 120 seats"]
+METAS = [{"type": "faq"}, {"source_url": "https://example.com"}]
+
+
+def test_saved_index_round_trips(tmp_path):
+    path = tmp_path / "lexical_index_v1.json"
+    BM25Index.build(IDS, DOCS, METAS).save(str(path))
+
+    index = BM25Index.load(str(path))
+    assert index is not None
+    assert index.ids[index.search("IT intake", 1)[0][0]] == "web-1"
+
+
+def test_index_from_other_tokenizer_is_not_loaded(tmp_path, capsys):
+    path = tmp_path / "lexical_index_v1.json"
+    BM25Index.build(IDS, DOCS, METAS).save(str(path))
+
+    data = json.loads(path.read_text(encoding="utf-8"))
+    data["tokenizer"] = TOKENIZER_VERSION - 1
+    path.write_text(json.dumps(data), encoding="utf-8")
+
+    assert BM25Index.load(str(path)) is None
+    assert "dense retrieval only" in capsys.readouterr().out
@@ -0,0 +1,76 @@
+"""Parsing of student questions into planner ASTs (no database needed)."""
+import pytest
+
+from database.sql import query_planner as qp
+from database.sql.query_planner import Compare, HasCompany, IsNull, Ranking
+
+# students.branch values in the shipped dataset
+STORED_BRANCHES = {"CE", "CSE", "CSE (AI&ML)", "CSE (DS)", "EEE", "IT", "MECH"}
+
+
+def branch_of(query):
+    return qp.parse_query(query).filter_value("branch")
+
+
+# ---------------- BRANCHES ----------------
+def test_every_alias_maps_to_a_stored_branch():
+    assert set(qp.BRANCHES.values()) == STORED_BRANCHES
+
+
+@pytest.mark.parametrize("query, branch", [
+    ("how many civil students", "CE"),
+    ("how many ce students", "CE"),
+    ("students in csm", "CSE (AI&ML)"),
+    ("list aiml students", "CSE (AI&ML)"),
+    ("how many CSE (AI&ML) students", "CSE (AI&ML)"),
+    ("students in csd", "CSE (DS)"),
+    ("how many CSE (DS) students", "CSE (DS)"),
+    ("data science students above 8", "CSE (DS)"),
+    ("how many cse students", "CSE"),
+    ("mechanical students placed", "MECH"),
+    ("how many IT students", "IT"),
+    ("students of it branch", "IT"),
+])
+def test_branch_aliases(query, branch):
+    assert branch_of(query) == branch
+
+
+def test_lowercase_it_is_a_pronoun():
+    assert branch_of("is it placed") is None
+
+
+def test_unknown_branch_is_reported():
+    plan = qp.parse_query("how many ece students")
+    assert plan.unknown_branch == "ECE"
+    assert branch_of("how many ece students") is None
+    assert "no ECE branch" in qp.unknown_branch_message(plan)
+
+
+# ---------------- COMPANIES ----------------
+@pytest.mark.parametrize("query, company", [
+    ("students placed in ncr atleos", "ncr atleos"),
+    ("how many students placed in ncr atleos from cse", "ncr atleos"),
+    ("placed at camelq software solutions?", "camelq software solutions"),
+    ("placed in savantis, cgpa above 8", "savantis"),
+    ("students placed at [247].ai", "[247].ai"),
+])
+def test_company_runs_to_end_of_clause(query, company):
+    filters = qp.parse_query(query).filters
+    assert HasCompany(company) in filters
+
+
+def test_placed_in_branch_is_not_a_company():
+    filters = qp.parse_query("students placed in cse").filters
+    assert Compare("branch", "=", "CSE") in filters
+    assert IsNull("company_norm", negated=True) in filters
+
+
+# ---------------- COUNTS / TOP N ----------------
+def test_roll_number_of_is_not_a_count():
+    assert qp.parse_query("roll number of students in cse").aggregate is None
+
+
+def test_top_n_is_a_ranked_listing():
+    plan = qp.parse_query("top 5 students in cse")
+    assert plan.aggregate is None
+    assert plan.ranking == Ranking("cgpa", 5)
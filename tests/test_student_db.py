@@ -0,0 +1,115 @@
+"""
+init_student.py against the shipped data/rawdata/student_dataset.xlsx,
+built into a scratch database, and the planner's aggregates over it.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("openpyxl")
+
+from database.sql import query_planner as qp          # noqa: E402
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+INIT_SCRIPT = os.path.join(PROJECT_ROOT, "database", "sql", "init_student.py")
+
+
+def build_db(db_path, *args):
+    env = dict(os.environ, STUDENTS_DB_PATH=str(db_path))
+    subprocess.run([sys.executable, INIT_SCRIPT, *args], env=env, check=True,
+                   cwd=PROJECT_ROOT, stdout=subprocess.PIPE)
+
+
+@pytest.fixture(scope="module")
+def conn(tmp_path_factory):
+    db_path = tmp_path_factory.mktemp("students") / "students.db"
+    build_db(db_path)
+    conn = sqlite3.connect(str(db_path))
+    yield conn
+    conn.close()
+
+
+def answer(conn, query, use_rollup):
+    sql, params = qp.compile_query(qp.parse_query(query), use_rollup)
+    return conn.execute(sql, params).fetchall()
+
+
+# ---------------- NORMALIZATION ----------------
+def test_not_placed_is_null(conn):
+    values = {r[0] for r in conn.execute("SELECT DISTINCT company_norm FROM students")}
+    assert None in values
+    assert not values & {"not placed", "-", "na", ""}
+
+
+@pytest.mark.parametrize("use_rollup", [False, True])
+def test_placed_and_not_placed_add_up(conn, use_rollup):
+    total = answer(conn, "how many students", use_rollup)[0][0]
+    placed = answer(conn, "how many students are placed", use_rollup)[0][0]
+    not_placed = answer(conn, "how many students are not placed", use_rollup)[0][0]
+
+    assert total == conn.execute("SELECT COUNT(*) FROM students").fetchone()[0]
+    assert 0 < placed < total
+    assert placed + not_placed == total
+
+
+@pytest.mark.parametrize("use_rollup", [False, True])
+def test_branch_placement_rates_are_partial(conn, use_rollup):
+    rates = dict(answer(conn, "branch-wise placement rate", use_rollup))
+    assert rates
+    assert all(0 <= rate < 100 for rate in rates.values())
+
+
+# ---------------- COMPANIES ----------------
+def test_company_lists_are_split(conn):
+    companies = [r[0] for r in answer(conn, "placements per company", False)]
+    assert companies
+    assert not any("," in c or c.lower() == "not placed" for c in companies)
+
+    # "Kasmo Digital, Savantis" counts for Savantis too
+    exact = conn.execute("SELECT COUNT(*) FROM students WHERE company_norm = 'savantis'").fetchone()[0]
+    assert answer(conn, "how many students placed in savantis", False)[0][0] > exact
+
+
+def test_company_rows_match_placed_students(conn):
+    placed = conn.execute("SELECT COUNT(*) FROM students WHERE company_norm IS NOT NULL").fetchone()[0]
+    with_offer = conn.execute("SELECT COUNT(DISTINCT roll_no) FROM student_companies").fetchone()[0]
+    assert with_offer == placed
+
+
+# ---------------- SCHEMA VERSION ----------------
+def test_old_schema_version_is_rebuilt(tmp_path):
+    db_path = tmp_path / "students.db"
+    build_db(db_path)
+    with sqlite3.connect(str(db_path)) as c:
+        c.execute("PRAGMA user_version = 2")
+        c.execute("UPDATE students SET company_norm = 'not placed' WHERE company_norm IS NULL")
+
+    # Same Excel file, older schema: rebuilt rather than reported up to date
+    build_db(db_path)
+    with sqlite3.connect(str(db_path)) as c:
+        assert c.execute("PRAGMA user_version").fetchone()[0] == qp.ROLLUP_SCHEMA_VERSION
+        assert c.execute("SELECT COUNT(*) FROM students WHERE company_norm = 'not placed'").fetchone()[0] == 0
+
+
+# ---------------- BRANCHES ----------------
+@pytest.mark.parametrize("query", [
+    "how many civil students", "how many csm students", "how many csd students",
+    "how many CSE (DS) students", "how many aiml students", "how many IT students",
+    "how many eee students", "how many mech students", "how many cse students",
+])
+def test_branch_aliases_match_stored_rows(conn, query):
+    assert answer(conn, query, False)[0][0] > 0
+
+
+def test_cse_ds_is_not_plain_cse(conn):
+    ds = answer(conn, "how many CSE (DS) students", False)[0][0]
+    cse = answer(conn, "how many cse students", False)[0][0]
+    assert ds != cse
+
+
+def test_multi_word_company(conn):
+    assert answer(conn, "how many students placed in ncr atleos", False)[0][0] > 0